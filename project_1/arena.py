@@ -0,0 +1,243 @@
+# arena.py
+# Headless engine-vs-engine matches, played across a process pool from random
+# openings, with an Elo estimate and SPRT early stopping. For example
+# `python arena.py "minimax:depth=3" "minimax:depth=3,lmr=off" --games 400 --sprt 0 20`
+import argparse
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from engine_settings import *
+from benchmark import SEARCH_OPTIONS
+from game_logic import SearchContext, check_win, get_ai_move
+from transposition import TranspositionTable
+
+def parse_engine(spec, defaults):
+    # "kind:key=value,..." -> settings. Kinds are minimax and mcts; keys are depth, time,
+    # nodes, playouts, and a search option name (see benchmark.SEARCH_OPTIONS) = off
+    kind, _, options = spec.partition(":")
+    if kind not in ("minimax", "mcts"):
+        raise ValueError(f"unknown engine {kind!r} in {spec!r}")
+    settings = dict(defaults, kind=kind, disabled=[])
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        if key in SEARCH_OPTIONS and value == "off":
+            settings["disabled"].append(key)
+        elif key in ("depth", "nodes", "playouts"):
+            settings[key] = int(value)
+        elif key == "time":
+            settings[key] = None if value == "none" else float(value)
+        else:
+            raise ValueError(f"unknown option {option!r} in {spec!r}")
+    return settings
+
+class Engine:
+    # One side of a match. Returns its move and the nodes it searched: minimax nodes, not
+    # counting the threat pass before the search, or playouts for mcts
+    def __init__(self, settings):
+        self.settings = settings
+        self.tt = TranspositionTable(TT_SIZE_MB)
+        self.mcts = None
+        if settings["kind"] == "mcts":
+            from mcts import MCTSSearch
+            self.mcts = MCTSSearch()
+
+    def new_game(self):
+        self.tt.clear()
+        if self.mcts is not None:
+            self.mcts.reset()
+
+    def move(self, board, player):
+        settings = self.settings
+        if self.mcts is not None:
+            move = self.mcts.get_move(board, player, settings["time"], settings.get("playouts"))
+            return move, self.mcts.playouts
+        search = SearchContext(self.tt, settings["time"], settings["nodes"])
+        for name in settings["disabled"]:
+            attribute, value = SEARCH_OPTIONS[name]
+            setattr(search, attribute, value)
+        move = get_ai_move(board, player, max_depth=settings["depth"], search=search)
+        return move, search.nodes
+
+# Engines of this worker process, built on first use and kept for its later games
+_engines = {}
+
+def _engine(spec, settings):
+    if spec not in _engines:
+        _engines[spec] = Engine(settings)
+    return _engines[spec]
+
+def random_opening(rng, size, plies):
+    # `plies` stones on distinct cells within two of the center, black first
+    center = size // 2
+    cells = [(row, col) for row in range(center - 2, center + 3) for col in range(center - 2, center + 3)]
+    return [(row, col, "black" if i % 2 == 0 else "white") for i, (row, col) in enumerate(rng.sample(cells, plies))]
+
+def play_game(engines, size, opening):
+    # engines: {player: (spec, settings)}. Returns the winner (None for a draw) and, per
+    # player, its moves, total and longest move time, and nodes
+    players = {player: _engine(*engine) for player, engine in engines.items()}
+    for engine in players.values():
+        engine.new_game()
+    board = [[None for _ in range(size)] for _ in range(size)]
+    for row, col, player in opening:
+        board[row][col] = player
+    stats = {player: {"moves": 0, "time": 0.0, "max_time": 0.0, "nodes": 0} for player in players}
+    player = "black" if len(opening) % 2 == 0 else "white"
+    for _ in range(size * size - len(opening)):
+        start = time.perf_counter()
+        (row, col), nodes = players[player].move([line[:] for line in board], player)
+        elapsed = time.perf_counter() - start
+        player_stats = stats[player]
+        player_stats["moves"] += 1
+        player_stats["time"] += elapsed
+        player_stats["max_time"] = max(player_stats["max_time"], elapsed)
+        player_stats["nodes"] += nodes
+        board[row][col] = player
+        if check_win(row, col, player, board):
+            return player, stats
+        player = "white" if player == "black" else "black"
+    return None, stats
+
+def expected_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def elo_estimate(wins, draws, losses):
+    # Elo difference and its 95% margin, from the mean and spread of the game scores
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+
+    def elo(score):
+        score = min(max(score, 1e-6), 1 - 1e-6)
+        return -400 * math.log10(1 / score - 1)
+
+    return elo(score), (elo(score + margin) - elo(score - margin)) / 2
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    # Log-likelihood ratio of elo1 over elo0 for the results so far, by the normal
+    # approximation to the game scores used by cutechess-cli and fishtest. Half a game of
+    # each result is added so that a one-sided run, e.g. all wins, still has a spread
+    if not wins + draws + losses:
+        return 0.0
+    wins, draws, losses = wins + 0.5, draws + 0.5, losses + 0.5
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    score0, score1 = expected_score(elo0), expected_score(elo1)
+    return (score1 - score0) * (2 * score - score0 - score1) / (2 * variance / games)
+
+def report(results, llr=None, bounds=None):
+    wins, draws, losses = results["wins"], results["draws"], results["losses"]
+    games = wins + draws + losses
+    elo, margin = elo_estimate(wins, draws, losses)
+    line = (f"games {games:5d}  +{wins} ={draws} -{losses}  score {100 * (wins + draws / 2) / games:5.1f}%  "
+            f"Elo {elo:+7.1f} +/- {margin:5.1f}")
+    if llr is not None:
+        line += f"  LLR {llr:+.2f} ({bounds[0]:+.2f}, {bounds[1]:+.2f})"
+    print(line)
+
+def summary(results, engines):
+    # Move times include the threat pass; the node rate counts search nodes only
+    for name, spec in zip("AB", engines):
+        stats = results["stats"][name]
+        moves = max(stats["moves"], 1)
+        rate = stats["nodes"] / stats["time"] if stats["time"] else 0
+        print(f"{name} {spec}: {stats['moves']} moves, {stats['time'] / moves:.3f}s per move "
+              f"(longest {stats['max_time']:.3f}s), {rate:.0f} nodes/s")
+
+def run_match(args):
+    defaults = {"depth": args.depth, "time": args.time, "nodes": args.nodes}
+    engines = [args.engine_a, args.engine_b]
+    settings = [parse_engine(spec, defaults) for spec in engines]
+    rng = random.Random(args.seed)
+    # Each opening is played twice, once with A as black and once with A as white
+    openings = [random_opening(rng, args.size, args.opening_plies) for _ in range((args.games + 1) // 2)]
+    schedule = iter(range(args.games))
+    results = {"wins": 0, "draws": 0, "losses": 0,
+               "stats": {name: {"moves": 0, "time": 0.0, "max_time": 0.0, "nodes": 0} for name in "AB"}}
+    # SPRT stops once the log-likelihood ratio leaves (lower, upper)
+    lower = math.log(args.beta / (1 - args.alpha))
+    upper = math.log((1 - args.beta) / args.alpha)
+    record = open(args.record, 'a') if args.record else None
+    verdict = None
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        pending = {}
+
+        def submit():
+            for game in schedule:
+                a_player = "black" if game % 2 == 0 else "white"
+                b_player = "white" if a_player == "black" else "black"
+                players = {a_player: (engines[0], settings[0]), b_player: (engines[1], settings[1])}
+                future = pool.submit(play_game, players, args.size, openings[game // 2])
+                pending[future] = (game, a_player)
+                if len(pending) >= 2 * args.workers:
+                    return
+
+        submit()
+        while pending and verdict is None:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                game, a_player = pending.pop(future)
+                winner, stats = future.result()
+                if winner is None:
+                    results["draws"] += 1
+                elif winner == a_player:
+                    results["wins"] += 1
+                else:
+                    results["losses"] += 1
+                for name, player in (("A", a_player), ("B", "white" if a_player == "black" else "black")):
+                    totals = results["stats"][name]
+                    for key, value in stats[player].items():
+                        totals[key] = max(totals[key], value) if key == "max_time" else totals[key] + value
+                if record is not None:
+                    record.write(json.dumps({"game": game, "opening": openings[game // 2], "a": a_player,
+                                             "winner": None if winner is None else "A" if winner == a_player else "B",
+                                             "stats": {"A" if player == a_player else "B": value
+                                                       for player, value in stats.items()}}) + "\n")
+            played = results["wins"] + results["draws"] + results["losses"]
+            llr = None
+            if args.sprt:
+                llr = sprt_llr(results["wins"], results["draws"], results["losses"], *args.sprt)
+                if llr >= upper:
+                    verdict = f"H1 accepted: A is at least {args.sprt[1]:+g} Elo better"
+                elif llr <= lower:
+                    verdict = f"H0 accepted: A is not more than {args.sprt[0]:+g} Elo better"
+            if played % args.report == 0 or verdict is not None or not pending:
+                report(results, llr, (lower, upper))
+            if verdict is None:
+                submit()
+        for future in pending:
+            future.cancel()
+    if record is not None:
+        record.close()
+    summary(results, engines)
+    if args.sprt:
+        print(verdict or "SPRT: no decision within the game limit")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Play engine A against engine B without a window")
+    parser.add_argument("engine_a", help='e.g. "minimax", "minimax:depth=4,lmr=off" or "mcts:time=0.5"')
+    parser.add_argument("engine_b")
+    parser.add_argument("--games", type=int, default=200, help="most games to play")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--size", type=int, default=ROWS, help="board side")
+    parser.add_argument("--opening-plies", type=int, default=2, help="random stones placed before the engines play")
+    parser.add_argument("--depth", type=int, default=MAX_DEPTH, help="default search depth")
+    parser.add_argument("--time", type=float, default=0.2, help="default seconds per move")
+    parser.add_argument("--nodes", type=int, default=None, help="default nodes per move")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the openings")
+    parser.add_argument("--sprt", type=float, nargs=2, metavar=("ELO0", "ELO1"),
+                        help="stop once A is shown to be ELO1 better than B, or not ELO0 better")
+    parser.add_argument("--alpha", type=float, default=0.05, help="SPRT false positive rate")
+    parser.add_argument("--beta", type=float, default=0.05, help="SPRT false negative rate")
+    parser.add_argument("--report", type=int, default=10, help="games between progress lines")
+    parser.add_argument("--record", help="file to append one JSON line per game to")
+    run_match(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
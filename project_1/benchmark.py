@@ -0,0 +1,218 @@
+# benchmark.py
+# Engine benchmarks on a fixed set of positions, e.g. `python benchmark.py parallel`
+import argparse
+import time
+from engine_settings import *
+from game_logic import SearchContext, attach_evaluator, center_bonus, evaluate_position, get_ai_move, pattern_score, search_root
+from game_state import GameState
+from transposition import TranspositionTable
+
+# Move sequences from an empty 10x10 board, black first
+POSITIONS = [
+    [(5, 5), (4, 5), (6, 4), (4, 6), (5, 3), (4, 4), (4, 2), (7, 5)],
+    [(5, 5), (4, 5), (4, 4), (6, 6), (6, 7), (4, 6), (7, 6), (5, 8), (5, 4), (7, 7),
+     (6, 5), (4, 3), (3, 4), (5, 9)],
+    [(5, 5), (4, 5), (4, 4), (6, 6), (4, 6), (6, 7), (3, 5), (5, 4), (6, 8), (5, 7),
+     (5, 3), (5, 6), (3, 4), (2, 6), (6, 2), (7, 1), (4, 8), (7, 8), (7, 6), (8, 9)],
+    [(4, 4), (5, 5), (3, 5), (5, 3), (3, 4), (6, 6), (5, 4), (3, 3), (2, 3), (2, 4), (1, 2)],
+    [(4, 4), (3, 4), (5, 4), (3, 3), (4, 3), (3, 2), (3, 5), (4, 2), (5, 3), (6, 2), (2, 2)],
+    [(4, 4), (5, 5), (3, 5), (5, 3), (4, 6), (5, 4), (5, 2), (6, 4), (5, 7), (2, 4), (1, 3)],
+]
+
+def position_board(moves, size=10):
+    # Board after `moves`, and the player to move; on a larger board the moves are
+    # moved to its middle
+    offset = (size - 10) // 2
+    board = [[None for _ in range(size)] for _ in range(size)]
+    player = "black"
+    for row, col in moves:
+        board[row + offset][col + offset] = player
+        player = "white" if player == "black" else "black"
+    return board, player
+
+def bench_parallel(args):
+    from parallel import SEARCHERS
+    start = time.perf_counter()
+    for moves in POSITIONS:
+        board, player = position_board(moves)
+        get_ai_move(board, player, time_limit=None, max_depth=args.depth)
+    serial = time.perf_counter() - start
+    print(f"in-process  {serial:7.2f}s")
+
+    for workers in args.workers:
+        searcher = SEARCHERS[args.mode](workers)
+        # Start the worker processes before timing
+        for future in [searcher.pool.submit(int) for _ in range(workers)]:
+            future.result()
+        start = time.perf_counter()
+        nodes = 0
+        for moves in POSITIONS:
+            board, player = position_board(moves)
+            searcher.get_move(board, player, time_limit=None, max_depth=args.depth)
+            nodes += searcher.nodes
+        elapsed = time.perf_counter() - start
+        searcher.close()
+        print(f"{workers} worker(s) {elapsed:7.2f}s  {nodes:9d} nodes  speedup x{serial / elapsed:.2f}")
+
+SEARCH_OPTIONS = {
+    "pvs": ("pvs", False),
+    "aspiration": ("aspiration", None),
+    "lmr": ("lmr", False),
+    "futility": ("futility", False),
+    "quiescence": ("quiescence", False),
+}
+
+def search_nodes(moves, depth, disabled, aspiration=ASPIRATION_WINDOW):
+    board, player = position_board(moves)
+    state = GameState(board)
+    attach_evaluator(state)
+    search = SearchContext(TranspositionTable(4))
+    search.aspiration = aspiration
+    for name in disabled:
+        attribute, value = SEARCH_OPTIONS[name]
+        setattr(search, attribute, value)
+    scores = []
+    for iteration in range(1, depth + 1):
+        score, move = search_root(state, iteration, player, search, scores=scores)
+        scores.append(score)
+    return search.nodes, move
+
+def bench_nodes(args):
+    # Nodes searched on every position with everything enabled, and with each option
+    # off; with --aspiration, with each of those window half-widths instead
+    if args.aspiration:
+        for window in args.aspiration:
+            start = time.perf_counter()
+            results = [search_nodes(moves, args.depth, [], window) for moves in POSITIONS]
+            elapsed = time.perf_counter() - start
+            counts = " ".join(f"{nodes:7d}" for nodes, _ in results)
+            print(f"window {window:<7d} {sum(nodes for nodes, _ in results):9d} nodes {elapsed:6.2f}s  {counts}")
+        return
+    configurations = ([("all on", [])] + [(f"no {name}", [name]) for name in SEARCH_OPTIONS] +
+                      [("all off", list(SEARCH_OPTIONS))])
+    for label, disabled in configurations:
+        start = time.perf_counter()
+        results = [search_nodes(moves, args.depth, disabled) for moves in POSITIONS]
+        elapsed = time.perf_counter() - start
+        counts = " ".join(f"{nodes:7d}" for nodes, _ in results)
+        print(f"{label:14s} {sum(nodes for nodes, _ in results):9d} nodes {elapsed:6.2f}s  {counts}")
+        print(f"{'':14s} moves {' '.join(str(move) for _, move in results)}")
+
+def bench_mcts(args):
+    # MCTS playout rate on every position (positions with a forced move play no playouts)
+    from mcts import MCTSSearch
+    for moves in POSITIONS:
+        board, player = position_board(moves)
+        searcher = MCTSSearch(seed=0)
+        start = time.perf_counter()
+        move = searcher.get_move(board, player, time_limit=args.time)
+        elapsed = time.perf_counter() - start
+        print(f"{searcher.playouts:7d} playouts {elapsed:6.2f}s {searcher.playouts / elapsed:8.0f}/s  "
+              f"{searcher.size:7d} nodes  move {move}")
+
+def bench_latency(args):
+    # Time per AI move on every position, centered on each board size. The whole
+    # get_ai_move call is timed, threat pass included; with --time, calls that overrun
+    # the limit by more than --slack are listed and the exit status is 1
+    over = []
+    for size in args.sizes:
+        times = []
+        for index, moves in enumerate(POSITIONS):
+            board, player = position_board(moves, size)
+            start = time.perf_counter()
+            get_ai_move(board, player, time_limit=args.time, max_depth=args.depth)
+            elapsed = time.perf_counter() - start
+            times.append(elapsed)
+            if args.time is not None and elapsed > args.time + args.slack:
+                over.append((size, index, elapsed))
+        per_position = " ".join(f"{elapsed:6.3f}" for elapsed in times)
+        print(f"{size:2d}x{size:<2d} mean {sum(times) / len(times):6.3f}s  max {max(times):6.3f}s  {per_position}")
+    for size, index, elapsed in over:
+        print(f"over budget: {size}x{size} position {index} took {elapsed:.3f}s of {args.time}s")
+    if over:
+        raise SystemExit(1)
+
+# Shapes on one row of a 10x10 board: X are black stones, O white ones
+SHAPES = ["XX_XX", "X_XXX", "XXX_X", "X_XX", "XX_X", "X_X", "XX", "XXX", "XXXX", "XXXXX",
+          "OXX_XX", "XX_XXO", "OX_XXX", "XX_XX_XX", "X_X_X", "_XX_XO"]
+
+def baseline_patterns(board, player):
+    # Pattern score of the original evaluator: from every stone that does not continue
+    # a run of its own, the next five cells are read, skipping at most one empty cell.
+    # Unlike the original it leaves out runs closed at both ends, and scores a five the
+    # same whether open or not, as the tables do
+    rows, cols = len(board), len(board[0])
+    score = 0
+    for row in range(rows):
+        for col in range(cols):
+            stone = board[row][col]
+            if stone is None:
+                continue
+            for dr, dc in ((1, 0), (0, 1), (1, 1), (1, -1)):
+                r, c = row - dr, col - dc
+                before = board[r][c] if 0 <= r < rows and 0 <= c < cols else "wall"
+                if before == stone:
+                    continue
+                length = empties = 0
+                for k in range(5):
+                    r, c = row + k * dr, col + k * dc
+                    cell = board[r][c] if 0 <= r < rows and 0 <= c < cols else "wall"
+                    if cell == stone:
+                        length += 1
+                    elif cell is None and not empties:
+                        empties = 1
+                    else:
+                        empties += cell is None
+                        break
+                before_open = before is None
+                if length >= 2 and (before_open or empties):
+                    pattern = pattern_score(length, before_open and empties > 0 and length < 5,
+                                            stone == player)
+                    score += pattern if stone == player else -pattern
+    return score
+
+def bench_shapes(args):
+    # The evaluation of gapped and solid shapes against the original evaluator's rule,
+    # scored for white; the exit status is 1 if any differ
+    wrong = 0
+    for shape in SHAPES:
+        board, _ = position_board([])
+        for col, cell in enumerate(shape, 2):
+            board[5][col] = {"X": "black", "O": "white"}.get(cell)
+        state = GameState(board)
+        score = evaluate_position(state, "white") - center_bonus(state, "white") + center_bonus(state, "black")
+        expected = baseline_patterns(board, "white")
+        wrong += score != expected
+        print(f"{shape:10s} {score:8d} {expected:8d}{'' if score == expected else '  differs'}")
+    if wrong:
+        raise SystemExit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Gomoku engine benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    parallel = commands.add_parser("parallel", help="parallel search at several worker counts")
+    parallel.add_argument("--mode", choices=["root", "smp"], default="root",
+                          help="root splitting or Lazy SMP with a shared table")
+    parallel.add_argument("--depth", type=int, default=4)
+    parallel.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parallel.set_defaults(run=bench_parallel)
+    nodes = commands.add_parser("nodes", help="node counts with each search option switched off")
+    nodes.add_argument("--depth", type=int, default=4)
+    nodes.add_argument("--aspiration", type=int, nargs="+", help="aspiration window half-widths to compare")
+    nodes.set_defaults(run=bench_nodes)
+    mcts = commands.add_parser("mcts", help="MCTS playouts per second")
+    mcts.add_argument("--time", type=float, default=2.0, help="seconds per position")
+    mcts.set_defaults(run=bench_mcts)
+    latency = commands.add_parser("latency", help="seconds per AI move at several board sizes")
+    latency.add_argument("--depth", type=int, default=3)
+    latency.add_argument("--sizes", type=int, nargs="+", default=[10, 15, 19])
+    latency.add_argument("--time", type=float, default=None, help="time limit per move to check (default none)")
+    latency.add_argument("--slack", type=float, default=0.05, help="seconds a move may overrun --time")
+    latency.set_defaults(run=bench_latency)
+    shapes = commands.add_parser("shapes", help="evaluation of gapped shapes against the original evaluator's rule")
+    shapes.set_defaults(run=bench_shapes)
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
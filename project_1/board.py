@@ -1,21 +1,54 @@
 import sys
+import asyncio
+import threading
+import traceback
 import pygame
+from concurrent.futures import ThreadPoolExecutor
 from constants import *
 from gui_elements import Button, Star
-from game_logic import check_win, get_ai_move
+from game_logic import check_win, fallback_move, get_ai_move, get_ai_move_async, ponder, ponder_steps
+from steps import run_sliced
+from game_state import GameState
+from book import OpeningBook, book_file
+from cache import AnalysisCache, cache_file
+from transposition import TranspositionTable
 
 class Board:
     def __init__(self, WIN):  # Add WIN as a parameter
         self.WIN = WIN  # Store WIN as an instance variable
-        self.board = [[None for _ in range(COLS)] for _ in range(ROWS)]
+        # Board size of the next game, picked on the menu
+        self.rows, self.cols = ROWS, COLS
+        self.cell_size = BOARD_SIZE // max(self.rows, self.cols)
+        self.board = [[None for _ in range(self.cols)] for _ in range(self.rows)]
         self.current_player = "black"
         self.game_state = MENU
         self.game_mode = None
         self.stars = [Star(WIN) for _ in range(100)]
+        # Kept across AI turns so each search reuses the positions already analysed
+        self.tt = TranspositionTable(TT_SIZE_MB)
+        self.book = OpeningBook(book_file(self.rows, self.cols))
+        self.cache = AnalysisCache(cache_file(self.rows, self.cols)) if ANALYSIS_CACHE else None
+        self.parallel = None
+        if PARALLEL_WORKERS > 1:
+            # Only imported here: multiprocessing may be missing, e.g. in the web build
+            from parallel import SEARCHERS
+            self.parallel = SEARCHERS[PARALLEL_MODE](PARALLEL_WORKERS)
+        self.mcts = None
+        if ENGINE == "mcts":
+            from mcts import MCTSSearch
+            self.mcts = MCTSSearch()
+        # The AI searches on this thread, or in slices on the main loop where there are no
+        # threads, so the main loop keeps drawing; ai_stop cancels it
+        self.executor = ThreadPoolExecutor(max_workers=1) if AI_BACKGROUND == "thread" else None
+        self.ai_task = None
+        self.ai_stop = None
+        self.ponder_task = None
+        self.ponder_stop = None
         
         # Initialize buttons
         self.ai_mode_button = Button(WIDTH // 2 - 200, HEIGHT // 2 - 50, 400, 50, "Play vs AI", PURPLE,self.WIN)
         self.human_mode_button = Button(WIDTH // 2 - 200, HEIGHT // 2 + 50, 400, 50, "Play vs Human", BLUE,self.WIN)
+        self.size_button = Button(WIDTH // 2 - 200, HEIGHT // 2 + 150, 400, 50, f"Board: {self.rows}x{self.cols}", GRAY,self.WIN)
         self.restart_button = Button(WIDTH // 2 - 100, HEIGHT // 2 + 50, 200, 50, "Play Again", PURPLE,self.WIN)
         self.quit_button = Button(WIDTH // 2 + 20, HEIGHT // 2 + 50, 160, 50, "Quit", RED,self.WIN)
 
@@ -28,20 +61,21 @@ class Board:
         self.WIN.fill(BG_COLOR)
         self.draw_stars()
         
-        title = FONT_LARGE.render("Cosmic Gomoku", True, GOLD)
+        title = font("large").render("Cosmic Gomoku", True, GOLD)
         title_rect = title.get_rect(center=(WIDTH // 2, HEIGHT // 3))
         self.WIN.blit(title, title_rect)
         
         self.ai_mode_button.draw()
         self.human_mode_button.draw()
+        self.size_button.draw()
         
         pygame.display.update()
 
     def get_board_position(self, pos):
         x, y = pos
-        row = (y - BOARD_OFFSET_Y) // CELL_SIZE
-        col = (x - BOARD_OFFSET_X) // CELL_SIZE
-        if 0 <= row < ROWS and 0 <= col < COLS:
+        row = (y - BOARD_OFFSET_Y) // self.cell_size
+        col = (x - BOARD_OFFSET_X) // self.cell_size
+        if 0 <= row < self.rows and 0 <= col < self.cols:
             return row, col
         return None
 
@@ -63,64 +97,89 @@ class Board:
                 self.reset_game()
                 return
 
+            if self.size_button.handle_event(event):
+                self.set_board_size(BOARD_SIZES[(BOARD_SIZES.index(self.rows) + 1) % len(BOARD_SIZES)])
+
+    def set_board_size(self, size):
+        # Takes effect from the next game; the book and cache are kept per board size
+        self.rows = self.cols = size
+        self.cell_size = BOARD_SIZE // size
+        self.size_button.text = f"Board: {size}x{size}"
+        self.book.close()
+        self.book = OpeningBook(book_file(size, size))
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = AnalysisCache(cache_file(size, size))
+
     def draw_grid(self):
         self.WIN.fill(BG_COLOR)
         self.draw_stars()
         
-        board_rect = pygame.Rect(BOARD_OFFSET_X, BOARD_OFFSET_Y, BOARD_SIZE, BOARD_SIZE)
+        cell_size = self.cell_size
+        width, height = self.cols * cell_size, self.rows * cell_size
+        board_rect = pygame.Rect(BOARD_OFFSET_X, BOARD_OFFSET_Y, width, height)
         pygame.draw.rect(self.WIN, BOARD_COLOR, board_rect)
         
-        for i in range(ROWS + 1):
+        for i in range(self.rows + 1):
             start_x = BOARD_OFFSET_X
-            start_y = BOARD_OFFSET_Y + i * CELL_SIZE
-            end_x = BOARD_OFFSET_X + BOARD_SIZE
+            start_y = BOARD_OFFSET_Y + i * cell_size
+            end_x = BOARD_OFFSET_X + width
             end_y = start_y
             pygame.draw.line(self.WIN, GRAY, (start_x, start_y), (end_x, end_y), 1)
-            
-            start_x = BOARD_OFFSET_X + i * CELL_SIZE
+
+        for i in range(self.cols + 1):
+            start_x = BOARD_OFFSET_X + i * cell_size
             start_y = BOARD_OFFSET_Y
             end_x = start_x
-            end_y = BOARD_OFFSET_Y + BOARD_SIZE
+            end_y = BOARD_OFFSET_Y + height
             pygame.draw.line(self.WIN, GRAY, (start_x, start_y), (end_x, end_y), 1)
         
-        for row in range(ROWS):
-            for col in range(COLS):
+        for row in range(self.rows):
+            for col in range(self.cols):
                 if self.board[row][col] is not None:
-                    x = BOARD_OFFSET_X + col * CELL_SIZE + CELL_SIZE // 2
-                    y = BOARD_OFFSET_Y + row * CELL_SIZE + CELL_SIZE // 2
+                    x = BOARD_OFFSET_X + col * cell_size + cell_size // 2
+                    y = BOARD_OFFSET_Y + row * cell_size + cell_size // 2
                     color = BLACK if self.board[row][col] == "black" else WHITE
-                    pygame.draw.circle(self.WIN, color, (x, y), CELL_SIZE // 2 - 5)
+                    pygame.draw.circle(self.WIN, color, (x, y), cell_size // 2 - cell_size // 12)
         
-        turn_text = f"{'Your' if self.current_player == 'black' else 'AI'}'s Turn" if self.game_mode == "ai" else f"{'Black' if self.current_player == 'black' else 'White'}'s Turn"
+        if self.game_state == AI_THINKING:
+            turn_text = "AI is thinking..."
+        else:
+            turn_text = f"{'Your' if self.current_player == 'black' else 'AI'}'s Turn" if self.game_mode == "ai" else f"{'Black' if self.current_player == 'black' else 'White'}'s Turn"
         
-        text_surface = FONT_MEDIUM.render(turn_text, True, GOLD)
+        text_surface = font("medium").render(turn_text, True, GOLD)
         self.WIN.blit(text_surface, (20, 20))
         
         pygame.display.update()
 
     def draw_hover(self, row, col):
-        if self.board[row][col] is None and 0 <= row < ROWS and 0 <= col < COLS:
-            x = BOARD_OFFSET_X + col * CELL_SIZE + CELL_SIZE // 2
-            y = BOARD_OFFSET_Y + row * CELL_SIZE + CELL_SIZE // 2
-            surface = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
+        cell_size = self.cell_size
+        if self.board[row][col] is None and 0 <= row < self.rows and 0 <= col < self.cols:
+            x = BOARD_OFFSET_X + col * cell_size + cell_size // 2
+            y = BOARD_OFFSET_Y + row * cell_size + cell_size // 2
+            surface = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
             pygame.draw.circle(surface, HIGHLIGHT_COLOR, 
-                               (CELL_SIZE // 2, CELL_SIZE // 2), 
-                               CELL_SIZE // 2 - 5)
-            self.WIN.blit(surface, (x - CELL_SIZE // 2, y - CELL_SIZE // 2))
+                               (cell_size // 2, cell_size // 2), 
+                               cell_size // 2 - cell_size // 12)
+            self.WIN.blit(surface, (x - cell_size // 2, y - cell_size // 2))
             pygame.display.update()
 
     def reset_game(self):
-        self.board = [[None for _ in range(COLS)] for _ in range(ROWS)]
+        self.cancel_ai()
+        self.stop_ponder()
+        self.board = [[None for _ in range(self.cols)] for _ in range(self.rows)]
+        self.tt.clear()
         self.current_player = "black"
         self.game_state = PLAYING
         self.draw_grid()
     
     def draw_winning_line(self,win_result):
         start, end = win_result
-        start_pos = (BOARD_OFFSET_X + start[1] * CELL_SIZE + CELL_SIZE // 2, 
-                  BOARD_OFFSET_Y + start[0] * CELL_SIZE + CELL_SIZE // 2)
-        end_pos = (BOARD_OFFSET_X + end[1] * CELL_SIZE + CELL_SIZE // 2, 
-                  BOARD_OFFSET_Y + end[0] * CELL_SIZE + CELL_SIZE // 2)
+        cell_size = self.cell_size
+        start_pos = (BOARD_OFFSET_X + start[1] * cell_size + cell_size // 2, 
+                  BOARD_OFFSET_Y + start[0] * cell_size + cell_size // 2)
+        end_pos = (BOARD_OFFSET_X + end[1] * cell_size + cell_size // 2, 
+                  BOARD_OFFSET_Y + end[0] * cell_size + cell_size // 2)
         pygame.draw.line(self.WIN, RED, start_pos, end_pos, 8)
         pygame.display.update()
 
@@ -136,7 +195,7 @@ class Board:
         else:
             message = f"{'Black' if player == 'black' else 'White'} won!"
     
-        text = FONT_LARGE.render(message, True, GOLD)
+        text = font("large").render(message, True, GOLD)
         self.WIN.blit(text, (WIDTH//2 - text.get_width()//2, HEIGHT//2 - text.get_height()))
     
         self.restart_button.draw()
@@ -146,6 +205,7 @@ class Board:
 
     def place_stone(self, row, col):
         if self.board[row][col] is None:
+            self.stop_ponder()
             self.board[row][col] = self.current_player
             self.draw_grid()
             
@@ -160,7 +220,91 @@ class Board:
                 if self.game_mode == "ai" and self.current_player == "white":
                     self.game_state = AI_THINKING
                     self.draw_grid()
-                    pygame.time.delay(500)
-                    row, col = get_ai_move(self.board,self.current_player)
-                    self.game_state = PLAYING
-                    self.place_stone(row, col)
+                    self.ai_stop = threading.Event()
+                    self.ai_task = asyncio.ensure_future(self.ai_turn(self.ai_stop))
+                    self.ai_task.add_done_callback(self.ai_turn_done)
+                elif self.game_mode == "ai":
+                    self.start_ponder()
+
+    def find_ai_move(self, board, player, stop):
+        # Runs on the executor thread
+        if self.mcts is not None:
+            return self.mcts.get_move(board, player, stop=stop)
+        if self.parallel is not None:
+            return self.parallel.get_move(board, player)
+        return get_ai_move(board, player, self.tt, cache=self.cache, stop=stop)
+
+    async def ai_turn(self, stop):
+        # Short pause so the player's stone is seen before the reply
+        await asyncio.sleep(0.5)
+        board = [row[:] for row in self.board]
+        entry = self.book.lookup(GameState(board))
+        if entry is not None:
+            row, col = entry[0]
+        elif self.executor is None and self.mcts is not None:
+            row, col = await run_sliced(self.mcts.move_steps(board, self.current_player, stop=stop))
+        elif self.executor is None:
+            row, col = await get_ai_move_async(board, self.current_player, self.tt, cache=self.cache, stop=stop)
+        else:
+            loop = asyncio.get_running_loop()
+            row, col = await loop.run_in_executor(self.executor, self.find_ai_move, board, self.current_player, stop)
+        if stop.is_set():
+            return
+        self.ai_task = None
+        self.game_state = PLAYING
+        self.place_stone(row, col)
+
+    def ai_turn_done(self, task):
+        # Nothing awaits the turn, so an error in it (book, search or executor) is
+        # reported here, and the AI plays the first move by move ordering instead, so the
+        # game goes on rather than staying AI_THINKING on the AI's turn
+        if task.cancelled() or task.exception() is None:
+            return
+        error = task.exception()
+        traceback.print_exception(type(error), error, error.__traceback__)
+        if self.ai_task is task:
+            self.ai_task = None
+            self.game_state = PLAYING
+            row, col = fallback_move(GameState(self.board), self.current_player)
+            self.place_stone(row, col)
+
+    def cancel_ai(self):
+        # Abandon the AI turn in progress; the search, threat pass included, stops at its
+        # next budget check, which frees the executor for the next turn or ponder
+        if self.ai_task is not None:
+            self.ai_stop.set()
+            if self.parallel is not None:
+                self.parallel.cancel()
+            self.ai_task.cancel()
+            self.ai_task = None
+
+    def start_ponder(self):
+        # Search on the player's time, into the table the AI's next search will use
+        if not USE_PONDER or self.parallel is not None or self.mcts is not None:
+            return
+        self.ponder_stop = threading.Event()
+        board = [row[:] for row in self.board]
+        if self.executor is None:
+            self.ponder_task = asyncio.ensure_future(run_sliced(ponder_steps(board, "white", self.tt, self.ponder_stop)))
+        else:
+            self.executor.submit(ponder, board, "white", self.tt, self.ponder_stop)
+
+    def stop_ponder(self):
+        # On the player's move. On the executor, the AI's search queues behind the
+        # ponder, which ends at its next budget check
+        if self.ponder_stop is not None:
+            self.ponder_stop.set()
+            self.ponder_stop = None
+        if self.ponder_task is not None:
+            self.ponder_task.cancel()
+            self.ponder_task = None
+
+    def close(self):
+        self.cancel_ai()
+        self.stop_ponder()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.parallel is not None:
+            self.parallel.close()
+        if self.cache is not None:
+            self.cache.close()
@@ -0,0 +1,131 @@
+# book.py
+# Opening book: positions searched deeply offline, stored as a sorted file of
+# (hash, move, score) records and looked up by binary search over an mmap.
+# Build it with e.g. `python book.py --plies 4 --width 3 --depth 6`; each board size has its own
+import argparse
+import mmap
+import os
+import struct
+import time
+from engine_settings import *
+from game_state import GameState, canonical
+from game_logic import SearchContext, attach_evaluator, search_root
+from transposition import TranspositionTable
+
+def book_file(rows=ROWS, cols=COLS):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), OPENING_BOOK.format(size=f"{rows}x{cols}"))
+
+# key, move (cell index in the canonical orientation), score for the player to move
+RECORD = struct.Struct('<QHi')
+SCORE_LIMIT = (1 << 31) - 1
+
+class OpeningBook:
+    # Read-only view of a book file; a missing or empty file is an empty book
+    def __init__(self, path=None):
+        path = path or book_file()
+        self.file = None
+        self.data = None
+        self.count = 0
+        if os.path.exists(path) and os.path.getsize(path) >= RECORD.size:
+            self.file = open(path, 'rb')
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.count = len(self.data) // RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    def _find(self, key):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if RECORD.unpack_from(self.data, middle * RECORD.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count:
+            record = RECORD.unpack_from(self.data, low * RECORD.size)
+            if record[0] == key:
+                return record
+        return None
+
+    def lookup(self, state):
+        # (move, score) stored for the position, or None
+        if not self.count:
+            return None
+        key, number = canonical(state)
+        record = self._find(key)
+        if record is None:
+            return None
+        # Map the move back from the canonical orientation
+        index = state.geometry.inverses[number][record[1]]
+        if state.occupied() >> index & 1:
+            return None
+        return divmod(index, state.cols), record[2]
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.file.close()
+            self.data = self.file = None
+            self.count = 0
+
+def analyse(state, player, depth, tt):
+    # (score, move, search) of iterative deepening to `depth` for `player`, no time limit
+    search = SearchContext(tt)
+    scores = []
+    for iteration in range(1, depth + 1):
+        score, move = search_root(state, iteration, player, search, scores=scores)
+        scores.append(score)
+    return score, move, search
+
+def write_book(path, entries):
+    # entries: {key: (move index, score)}
+    with open(path, 'wb') as book:
+        for key in sorted(entries):
+            index, score = entries[key]
+            book.write(RECORD.pack(key, index, min(max(score, -SCORE_LIMIT), SCORE_LIMIT)))
+
+def build(args):
+    # Breadth-first self-play from the empty board: every position is searched to
+    # `depth`, then its best `width` moves (the best move first, then by the search's
+    # move ordering) are played to reach the next ply. Every first move is expanded,
+    # since the human opens.
+    tt = TranspositionTable(args.tt_mb)
+    entries = {}
+    frontier = [[]]
+    start = time.perf_counter()
+    for ply in range(args.plies):
+        following = []
+        for moves in frontier:
+            state = GameState(rows=args.size, cols=args.size)
+            for row, col, player in moves:
+                state.place(row, col, player)
+            key, number = canonical(state)
+            if key in entries:
+                continue
+            player = "black" if len(moves) % 2 == 0 else "white"
+            attach_evaluator(state)
+            score, best, search = analyse(state, player, args.depth, tt)
+            entries[key] = (state.geometry.symmetries[number][best[0] * state.cols + best[1]], int(score))
+            ordered, _ = search.order_moves(state, state.get_valid_moves(), player, best)
+            for row, col in ordered[:args.width] if moves else ordered:
+                following.append(moves + [(row, col, player)])
+        frontier = following
+        print(f"ply {ply + 1}: {len(entries)} positions, {time.perf_counter() - start:.1f}s")
+    write_book(args.output, entries)
+    print(f"wrote {len(entries)} positions to {args.output}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Gomoku opening book")
+    parser.add_argument("--plies", type=int, default=4, help="positions stored have up to plies - 1 stones")
+    parser.add_argument("--width", type=int, default=3, help="moves followed from each position")
+    parser.add_argument("--depth", type=int, default=6, help="search depth per position")
+    parser.add_argument("--size", type=int, default=ROWS, help="board side")
+    parser.add_argument("--tt-mb", type=int, default=64)
+    parser.add_argument("--output", help="book file (default: the one for the board size)")
+    args = parser.parse_args()
+    args.output = args.output or book_file(args.size, args.size)
+    build(args)
+
+if __name__ == "__main__":
+    main()
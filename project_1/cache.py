@@ -0,0 +1,88 @@
+# cache.py
+# Persistent analysis cache: the best move and score found for a position at a given
+# depth, kept across runs in an append-only file with an in-memory index
+import os
+import struct
+from collections import OrderedDict
+from engine_settings import *
+from game_state import canonical
+
+def cache_file(rows=ROWS, cols=COLS):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), ANALYSIS_CACHE.format(size=f"{rows}x{cols}"))
+
+# key, depth, move (cell index in the canonical orientation), score for the player to move
+RECORD = struct.Struct('<QBHi')
+SCORE_LIMIT = (1 << 31) - 1
+
+class AnalysisCache:
+    # Records are only ever appended, and a later record for a position replaces the
+    # earlier one in the index. Once the index holds more than `max_entries` positions,
+    # or the file twice that many records, the least recently used positions are
+    # dropped and the file is rewritten with the rest. A file holds one board size.
+    def __init__(self, path=None, max_entries=ANALYSIS_CACHE_ENTRIES):
+        path = path or cache_file()
+        self.path = path
+        self.max_entries = max_entries
+        # key -> (depth, move, score), least recently used first
+        self.index = OrderedDict()
+        self.records = 0
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                data = file.read()
+            self.records = len(data) // RECORD.size
+            for key, depth, move, score in RECORD.iter_unpack(data[:self.records * RECORD.size]):
+                self.index[key] = (depth, move, score)
+                self.index.move_to_end(key)
+        self.file = open(path, 'ab')
+        # Drop a record cut short by a crash, so later appends stay aligned
+        self.file.truncate(self.records * RECORD.size)
+        if len(self.index) > max_entries:
+            self.compact()
+
+    def __len__(self):
+        return len(self.index)
+
+    def lookup(self, state, depth):
+        # (move, score) searched to at least `depth` for the position, or None
+        key, number = canonical(state)
+        entry = self.index.get(key)
+        if entry is None or entry[0] < depth:
+            return None
+        self.index.move_to_end(key)
+        if entry[1] >= state.geometry.cells:
+            return None
+        index = state.geometry.inverses[number][entry[1]]
+        if state.occupied() >> index & 1:
+            return None
+        return divmod(index, state.cols), entry[2]
+
+    def store(self, state, depth, score, move):
+        key, number = canonical(state)
+        entry = self.index.get(key)
+        if entry is not None and entry[0] > depth:
+            return
+        depth = min(depth, 255)
+        score = min(max(int(score), -SCORE_LIMIT), SCORE_LIMIT)
+        index = state.geometry.symmetries[number][move[0] * state.cols + move[1]]
+        self.index[key] = (depth, index, score)
+        self.index.move_to_end(key)
+        self.file.write(RECORD.pack(key, depth, index, score))
+        self.file.flush()
+        self.records += 1
+        if len(self.index) > self.max_entries or self.records > 2 * self.max_entries:
+            self.compact()
+
+    def compact(self):
+        while len(self.index) > self.max_entries:
+            self.index.popitem(last=False)
+        self.file.close()
+        # Written oldest first, so reloading keeps the least recently used order
+        with open(self.path + ".tmp", 'wb') as file:
+            for key, (depth, move, score) in self.index.items():
+                file.write(RECORD.pack(key, depth, move, score))
+        os.replace(self.path + ".tmp", self.path)
+        self.records = len(self.index)
+        self.file = open(self.path, 'ab')
+
+    def close(self):
+        self.file.close()
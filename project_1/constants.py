@@ -1,12 +1,11 @@
 # constants.py
+# Window, colors and fonts of the GUI, plus the engine settings
 import pygame
-pygame.init()
+from engine_settings import *
 
 # Game settings
 WIDTH, HEIGHT = 800, 800
 BOARD_SIZE = 600
-ROWS, COLS = 10, 10
-CELL_SIZE = BOARD_SIZE // COLS
 BOARD_OFFSET_X = (WIDTH - BOARD_SIZE) // 2
 BOARD_OFFSET_Y = (HEIGHT - BOARD_SIZE) // 2
 
@@ -29,10 +28,15 @@ PLAYING = "playing"
 AI_THINKING = "ai_thinking"
 GAME_OVER = "game_over"
 
-# AI settings
-MAX_DEPTH = 3
+# Fonts: (size, bold) by name, made on first use so that nothing starts pygame's
+# font system before the window does
+FONTS = {"large": (48, True), "medium": (36, False), "small": (24, False)}
+_fonts = {}
 
-# Fonts
-FONT_LARGE = pygame.font.SysFont("arial", 48, bold=True)
-FONT_MEDIUM = pygame.font.SysFont("arial", 36)
-FONT_SMALL = pygame.font.SysFont("arial", 24)
+def font(name):
+    if name not in _fonts:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        size, bold = FONTS[name]
+        _fonts[name] = pygame.font.SysFont("arial", size, bold=bold)
+    return _fonts[name]
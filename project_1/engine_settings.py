@@ -0,0 +1,50 @@
+# engine_settings.py
+# Settings of the AI and the board it plays on. Imports nothing from pygame, so the
+# engine modules load without it; the GUI's constants.py re-exports them
+import sys
+
+# Board
+ROWS, COLS = 10, 10  # Board size a game starts with
+BOARD_SIZES = (10, 15, 19)  # Sizes the menu offers
+MAX_BOARD = 32  # Largest board side; tables shared by all sizes key moves as row * MAX_BOARD + col
+
+# AI settings
+MAX_DEPTH = 5  # Deepest iteration of the iterative-deepening search
+AI_TIME_LIMIT = 2.0  # Seconds per AI move, or None for no limit
+AI_NODE_LIMIT = None  # Nodes per AI move, or None for no limit
+NODE_CHECK_INTERVAL = 128  # Nodes between budget checks, which are also where the search can pause
+AI_TIME_SLICE = 0.005  # Seconds the search runs between event loop turns when it shares the loop
+AI_BACKGROUND = "slices" if sys.platform == "emscripten" else "thread"  # Where the AI searches beside the UI
+USE_PVS = True  # Principal variation search: null windows after the first move
+ASPIRATION_WINDOW = 5000  # Half-width of the window around the last iteration's score (None = full window);
+                          # tune with `benchmark.py nodes --aspiration 2500 5000 10000`
+USE_LMR = True  # Late move reductions for quiet moves
+LMR_MIN_DEPTH = 3  # Only reduce at this remaining depth or more
+LMR_MIN_MOVES = 4  # Moves searched at full depth before reducing
+LMR_REDUCTION = 1  # Plies taken off a reduced move
+USE_FUTILITY = True  # Futility pruning of quiet moves near the leaves
+FUTILITY_MARGINS = (0, 6000, 15000)  # Margin by remaining depth; pruning applies below len()
+USE_QUIESCENCE = True  # Extend leaves with forcing moves (fours, blocks) until quiet
+QUIESCENCE_PLIES = 8  # Longest forcing line followed past the leaves
+USE_PONDER = True  # Search on the player's time, after their likeliest replies
+PONDER_REPLIES = 3  # Replies searched while pondering
+ENGINE = "minimax"  # or "mcts" for Monte Carlo Tree Search (needs numpy)
+MCTS_PLAYOUTS = None  # Playouts per MCTS move, or None to use the time limit only
+MCTS_LEAVES = 32  # Leaves selected per batch of playouts
+MCTS_ROLLOUTS = 8  # Playouts from each of them
+MCTS_EXPLORATION = 1.0  # UCT exploration constant
+MCTS_MAX_NODES = 200000  # Tree capacity; a full tree starts again from the next root
+PARALLEL_WORKERS = 0  # Search with this many processes (0 = search in-process)
+PARALLEL_MODE = "smp"  # "root" splits the root moves, "smp" runs Lazy SMP on a shared table
+THREAT_NODE_LIMIT = 5000  # Node cap of the forced-win (VCF/VCT) search run before minimax
+THREAT_THREE_NODE_LIMIT = 300  # Node cap of each search's phase with threes, which finds nothing in quiet positions
+THREAT_MAX_PLIES = 15  # Longest forced line it looks for
+THREAT_USE_THREES = True  # Attack with threes as well as fours (VCT), not fours only (VCF)
+CANDIDATE_RADIUS = 1  # Moves considered: empty cells within this many cells of a stone
+OPENING_BOOK = "opening_book_{size}.bin"  # Book file per board size ({size} is e.g. 15x15) next to the code, built by book.py (optional)
+ANALYSIS_CACHE = None  # File per board size of searched positions kept across runs, e.g. "analysis_cache_{size}.bin" (None = off)
+ANALYSIS_CACHE_ENTRIES = 100000  # Positions kept in it; the least recently used go first
+TT_SIZE_MB = 16  # Transposition table kept by the board between AI turns
+EVALUATOR = "incremental"  # or "numpy" for the vectorized evaluator (needs numpy)
+BATCH_FRONTIER = False  # Score depth-1 children in one NumPy batch (needs numpy)
+CHECK_INCREMENTAL_EVAL = False  # Compare every incremental score with a full board scan
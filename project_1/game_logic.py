@@ -1,217 +1,612 @@
 # game_logic.py
-from game_state import GameState
-from constants import *
-import random
-def evaluate_position(state, player):
-    score = 0
-    directions = [(1, 0), (0, 1), (1, 1), (1, -1)]
-    
-    weights = {
-        5: 100000,    # Win
-        4: {
-            'open': 50000,    # Open four (winning threat)
-            'closed': 10000   # Closed four
-        },
-        3: {
-            'open': 5000,     # Open three (major threat)
-            'closed': 1000,   # Closed three
-            'blocking': 7500  # Blocking opponent's 3 in a row
-        },
-        2: {
-            'open': 500,      # Open two
-            'closed': 100     # Closed two
-        }
+from game_state import GameState, DIRECTIONS, SEARCH_KEYS, iter_bits
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from threats import ThreatSolver, five_cells, four_moves, open_four_moves
+from steps import drain, run_sliced
+from engine_settings import *
+import time
+WEIGHTS = {
+    5: 100000,    # Win
+    4: {
+        'open': 50000,    # Open four (winning threat)
+        'closed': 10000   # Closed four
+    },
+    3: {
+        'open': 5000,     # Open three (major threat)
+        'closed': 1000,   # Closed three
+        'blocking': 7500  # Blocking opponent's 3 in a row
+    },
+    2: {
+        'open': 500,      # Open two
+        'closed': 100     # Closed two
     }
-    
-    for row in range(ROWS):
-        for col in range(COLS):
-            if state.board[row][col] is None:
-                continue
-            
-            for dr, dc in directions:
-                sequence, gap_position, is_double_open = get_sequence(state.board, row, col, dr, dc)
-                if not sequence:
-                    continue
-                
-                length = len(sequence)
-                current_player = sequence[0]
-                
-                if row > 0 and col > 0:
-                    prev_r, prev_c = row - dr, col - dc
-                    if (0 <= prev_r < ROWS and 0 <= prev_c < COLS and 
-                        state.board[prev_r][prev_c] == current_player):
-                        continue
-                
-                pattern_type = 'open' if is_double_open else 'closed'
-                
-                # Calculate pattern score
-                if length >= 5:
-                    pattern_score = weights[5]
-                elif length >= 4:
-                    pattern_score = weights[4][pattern_type]
-                elif length >= 3:
-                    # Modified logic for three-in-a-row patterns
-                    if is_double_open:
-                        if current_player != player:
-                            # If it's opponent's three in a row and double open,
-                            # consider it as blocking priority
-                            pattern_score = weights[3]['blocking']
-                        else:
-                            pattern_score = weights[3]['open']
-                    else:
-                        pattern_score = weights[3][pattern_type]
-                elif length >= 2:
-                    pattern_score = weights[2][pattern_type]
-                else:
+}
+
+def pattern_score(length, is_double_open, own):
+    pattern_type = 'open' if is_double_open else 'closed'
+    if length >= 5:
+        pattern_score = WEIGHTS[5]
+    elif length == 4:
+        pattern_score = WEIGHTS[4][pattern_type]
+    elif length == 3:
+        if is_double_open and not own:
+            # Opponent's open three is a blocking priority
+            pattern_score = WEIGHTS[3]['blocking']
+        else:
+            pattern_score = WEIGHTS[3][pattern_type]
+    elif length == 2:
+        pattern_score = WEIGHTS[2][pattern_type]
+    else:
+        return 0
+
+    # Adjust scores for opponent's threats
+    if not own:
+        if length >= 4:
+            pattern_score = pattern_score * 12 // 10
+        if is_double_open and length >= 3:
+            pattern_score = pattern_score * 11 // 10
+    return pattern_score
+
+# Window cells are coded from one player's point of view; off-board counts as blocked
+EMPTY, OWN, BLOCKED = 0, 1, 2
+WINDOW = 6
+WINDOW_CODES = 3 ** WINDOW
+
+def _window_scores(own):
+    # Score of the run that starts at the window's second cell, if it starts there. The
+    # run is read over the next five cells and may skip one empty cell, so X_XXX and
+    # XX_XX count as fours; it ends at a second empty cell, a blocked cell or a wall
+    table = [0] * WINDOW_CODES
+    for code in range(WINDOW_CODES):
+        cells = [code // 3 ** i % 3 for i in range(WINDOW)]
+        if cells[0] == OWN or cells[1] != OWN:
+            continue
+        length = empties = 0
+        for cell in cells[1:]:
+            if cell == OWN:
+                length += 1
+            elif cell == EMPTY and not empties:
+                empties = 1
+            else:
+                empties += cell == EMPTY
+                break
+        if length >= 5:
+            table[code] = pattern_score(5, False, own)
+            continue
+        before_open = cells[0] == EMPTY
+        after_open = empties > 0
+        if before_open or after_open:
+            table[code] = pattern_score(length, before_open and after_open, own)
+    return table
+
+OWN_SCORES = _window_scores(True)
+OPP_SCORES = _window_scores(False)
+
+class EvalTables:
+    # The evaluation's tables for one board size, built once per size by eval_tables()
+    def __init__(self, geometry):
+        self.lines = geometry.lines
+        center_row, center_col = geometry.rows // 2, geometry.cols // 2
+        rings = {}
+        for index in range(geometry.cells):
+            row, col = divmod(index, geometry.cols)
+            distance_to_center = abs(row - center_row) + abs(col - center_col)
+            rings[distance_to_center] = rings.get(distance_to_center, 0) | 1 << index
+        # (position bonus, cells) for each Manhattan distance from the center
+        self.center_rings = [(50 // (distance + 1), mask) for distance, mask in rings.items()]
+        self.center_bonus = [0] * geometry.cells
+        for bonus, cells in self.center_rings:
+            for index in iter_bits(cells):
+                self.center_bonus[index] = bonus
+        # Line codes keep one base-3 digit per cell, shifted up by one so the digit below
+        # the first cell is a wall, with walls above the last cell to fill the last window
+        self.line_walls = [BLOCKED + sum(BLOCKED * 3 ** (len(cells) + k) for k in range(1, WINDOW - 1))
+                           for cells in self.lines]
+        self.cell_digits = [[(line_id, 3 ** (position + 1)) for line_id, position in lines]
+                            for lines in geometry.cell_lines]
+        # Per cell, for each line through it: its digit, and the windows that hold it
+        # (the power of 3 that brings the first one down to the bottom of the code, and
+        # how many there are), as a stone only changes the score of those. Lines of up to
+        # twice that many windows are rescored whole instead (power None), which is cheaper
+        self.cell_windows = []
+        for lines in geometry.cell_lines:
+            windows = []
+            for line_id, position in lines:
+                length = len(self.lines[line_id])
+                if length <= 2 * WINDOW:
+                    windows.append((line_id, 3 ** (position + 1), None, length))
                     continue
-                
-                # Adjust scores for opponent's threats
-                if current_player != player:
-                    if length >= 4:
-                        pattern_score *= 1.2
-                    if is_double_open and length >= 3:
-                        pattern_score *= 1.1
-                
-                multiplier = 1 if current_player == player else -1
-                score += multiplier * pattern_score
-                
-                # Add position bonus
-                center_row, center_col = ROWS // 2, COLS // 2
-                distance_to_center = abs(row - center_row) + abs(col - center_col)
-                position_bonus = 50 * (1 / (distance_to_center + 1))
-                score += position_bonus * multiplier
-    
+                first = max(0, position - 4)
+                last = min(length - 1, position + 1)
+                windows.append((line_id, 3 ** (position + 1), 3 ** first, last - first + 1))
+            self.cell_windows.append(windows)
+
+_eval_tables = {}
+
+def eval_tables(geometry):
+    if geometry not in _eval_tables:
+        _eval_tables[geometry] = EvalTables(geometry)
+    return _eval_tables[geometry]
+
+def line_codes(state):
+    # Codes of every line as seen by black and by white
+    tables = eval_tables(state.geometry)
+    black, white = state.stones["black"], state.stones["white"]
+    codes = {"black": tables.line_walls[:], "white": tables.line_walls[:]}
+    for index in iter_bits(black):
+        for line_id, digit in tables.cell_digits[index]:
+            codes["black"][line_id] += OWN * digit
+            codes["white"][line_id] += BLOCKED * digit
+    for index in iter_bits(white):
+        for line_id, digit in tables.cell_digits[index]:
+            codes["white"][line_id] += OWN * digit
+            codes["black"][line_id] += BLOCKED * digit
+    return codes
+
+def stone_lines(state):
+    # Lines holding a stone; the others score nothing for either player
+    cell_digits = eval_tables(state.geometry).cell_digits
+    return {line_id for index in iter_bits(state.occupied()) for line_id, _ in cell_digits[index]}
+
+def line_scores(black_code, white_code, length):
+    # Score of one line from black's and from white's point of view
+    black_runs = black_opp = white_runs = white_opp = 0
+    for _ in range(length):
+        black_window = black_code % WINDOW_CODES
+        white_window = white_code % WINDOW_CODES
+        black_runs += OWN_SCORES[black_window]
+        black_opp += OPP_SCORES[black_window]
+        white_runs += OWN_SCORES[white_window]
+        white_opp += OPP_SCORES[white_window]
+        black_code //= 3
+        white_code //= 3
+    return black_runs - white_opp, white_runs - black_opp
+
+def center_bonus(state, player):
+    bits = state.stones[player]
+    return sum(bonus * (bits & cells).bit_count() for bonus, cells in eval_tables(state.geometry).center_rings)
+
+def evaluate_position(state, player):
+    opponent = "white" if player == "black" else "black"
+    lines = state.geometry.lines
+    codes = line_codes(state)
+    score = center_bonus(state, player) - center_bonus(state, opponent)
+    for line_id in stone_lines(state):
+        black_score, white_score = line_scores(codes["black"][line_id], codes["white"][line_id], len(lines[line_id]))
+        score += black_score if player == "black" else white_score
     return score
 
-def get_sequence(board, row, col, dr, dc):
-    sequence = []
-    player = board[row][col]
-    
-    # Check backwards first to find start of sequence
-    r, c = row - dr, col - dc
-    backwards_empty = 0
-    while 0 <= r < ROWS and 0 <= c < COLS and board[r][c] is None:
-        backwards_empty += 1
-        r, c = r - dr, c - dc
-    
-    # Now check forwards
-    r, c = row, col
-    gap_found = False
-    gap_position = None
-    forwards_empty = 0
-    
-    for i in range(5):
-        if not (0 <= r < ROWS and 0 <= c < COLS):
-            break
-        
-        current = board[r][c]
-        if current == player:
-            sequence.append(current)
-        elif current is None and not gap_found:
-            gap_found = True
-            gap_position = len(sequence)
-            forwards_empty += 1
-        elif current is None:
-            forwards_empty += 1
-            break
-        else:
-            break
-        
-        r, c = r + dr, c + dc
-    
-    is_double_open = (backwards_empty > 0 and forwards_empty > 0)
-    return sequence, gap_position, is_double_open
-
-def is_sequence_open(board, row, col, dr, dc):
-    player = board[row][col]
-    sequence_length = len(get_sequence(board, row, col, dr, dc))
-    
-    r, c = row - dr, col - dc
-    before_open = (0 <= r < ROWS and 0 <= c < COLS and 
-                  board[r][c] is None)
-    
-    r, c = row + (sequence_length * dr), col + (sequence_length * dc)
-    after_open = (0 <= r < ROWS and 0 <= c < COLS and 
-                 board[r][c] is None)
-    
-    if before_open and after_open:
-        return 2
-    elif before_open or after_open:
-        return 1
-    return 0
-
-def minimax(state, depth, alpha, beta, maximizing_player, player):
-    if depth == 0:
-        return evaluate_position(state, player), None
-        
-    valid_moves = state.get_valid_moves()
+class IncrementalEvaluator:
+    # Keeps evaluate_position's score up to date as stones are placed and undone.
+    # Attach with `state.evaluator = IncrementalEvaluator(state)`; with check=True
+    # every score is compared against a full evaluate_position scan.
+    def __init__(self, state, check=False):
+        self.state = state
+        self.check = check
+        self.tables = eval_tables(state.geometry)
+        self.codes = line_codes(state)
+        self.line_scores = [(0, 0)] * len(self.tables.lines)
+        for line_id in stone_lines(state):
+            self.line_scores[line_id] = line_scores(self.codes["black"][line_id], self.codes["white"][line_id],
+                                                    len(self.tables.lines[line_id]))
+        black_bonus = center_bonus(state, "black")
+        white_bonus = center_bonus(state, "white")
+        self.totals = {
+            "black": sum(scores[0] for scores in self.line_scores) + black_bonus - white_bonus,
+            "white": sum(scores[1] for scores in self.line_scores) + white_bonus - black_bonus,
+        }
+
+    def update(self, row, col, player, placed):
+        index = row * self.state.cols + col
+        opponent = "white" if player == "black" else "black"
+        sign = 1 if placed else -1
+        own_codes, opp_codes = self.codes[player], self.codes[opponent]
+        black_codes, white_codes = self.codes["black"], self.codes["white"]
+        for line_id, digit, power, windows in self.tables.cell_windows[index]:
+            if power is None:
+                # Rescored whole; self.line_scores keeps the score of these lines
+                own_codes[line_id] += sign * OWN * digit
+                opp_codes[line_id] += sign * BLOCKED * digit
+                old_black, old_white = self.line_scores[line_id]
+                new_black, new_white = line_scores(black_codes[line_id], white_codes[line_id], windows)
+                self.line_scores[line_id] = (new_black, new_white)
+            else:
+                old_black, old_white = line_scores(black_codes[line_id] // power, white_codes[line_id] // power, windows)
+                own_codes[line_id] += sign * OWN * digit
+                opp_codes[line_id] += sign * BLOCKED * digit
+                new_black, new_white = line_scores(black_codes[line_id] // power, white_codes[line_id] // power, windows)
+            self.totals["black"] += new_black - old_black
+            self.totals["white"] += new_white - old_white
+        bonus = sign * self.tables.center_bonus[index]
+        self.totals[player] += bonus
+        self.totals[opponent] -= bonus
+
+    def score(self, player):
+        score = self.totals[player]
+        if self.check:
+            expected = evaluate_position(self.state, player)
+            if score != expected:
+                raise AssertionError(
+                    f"incremental score {score} != full scan {expected} after {self.state.moves}")
+        return score
+
+def attach_evaluator(state):
+    if EVALUATOR == "numpy":
+        from vectorized import ArrayEvaluator
+        state.evaluator = ArrayEvaluator(state, check=CHECK_INCREMENTAL_EVAL)
+    else:
+        state.evaluator = IncrementalEvaluator(state, check=CHECK_INCREMENTAL_EVAL)
+    return state.evaluator
+
+def evaluate(state, player):
+    if state.evaluator is not None:
+        return state.evaluator.score(player)
+    return evaluate_position(state, player)
+
+def evaluate_frontier(state, moves, maximizing_player, player):
+    # Depth-1 node: score all children in one NumPy batch and pick the best
+    from vectorized import score_children
+    mover = player if maximizing_player else ("white" if player == "black" else "black")
+    scores = score_children(state, moves, mover, player)
+    best = int(scores.argmax() if maximizing_player else scores.argmin())
+    return int(scores[best]), moves[best]
+
+class SearchTimeout(Exception):
+    pass
+
+class SearchContext:
+    # State shared by every node of one search: the transposition table, the
+    # killer-move and history tables used for move ordering, and the node/time budget.
+    # `stop` is an optional Event that aborts the search once set. The tables fit any
+    # board size: killers by ply, history by row * MAX_BOARD + col.
+    def __init__(self, tt=None, time_limit=None, node_limit=None, stop=None):
+        self.tt = tt
+        self.stop = stop
+        self.killers = [[] for _ in range(MAX_BOARD * MAX_BOARD + 1)]
+        self.history = {"black": [0] * (MAX_BOARD * MAX_BOARD), "white": [0] * (MAX_BOARD * MAX_BOARD)}
+        self.nodes = 0
+        self.node_limit = node_limit
+        self.deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        self.next_check = NODE_CHECK_INTERVAL if node_limit is None else min(NODE_CHECK_INTERVAL, node_limit)
+        self.pvs = USE_PVS
+        self.aspiration = ASPIRATION_WINDOW
+        self.lmr = USE_LMR
+        self.futility = USE_FUTILITY
+        self.quiescence = USE_QUIESCENCE
+
+    def check_budget(self):
+        # Called every NODE_CHECK_INTERVAL nodes so the clock is read rarely
+        self.next_check = self.nodes + NODE_CHECK_INTERVAL
+        if self.node_limit is not None:
+            if self.nodes >= self.node_limit:
+                raise SearchTimeout
+            self.next_check = min(self.next_check, self.node_limit)
+        if self.out_of_time():
+            raise SearchTimeout
+
+    def out_of_time(self):
+        # Past the deadline or stopped; the node limit is left to check_budget
+        return ((self.deadline is not None and time.perf_counter() >= self.deadline) or
+                (self.stop is not None and self.stop.is_set()))
+
+    def order_moves(self, state, moves, mover, tt_move):
+        # TT move, then moves that make or block a four, then killers, then by history.
+        # Returns the ordered moves and the bitmask of those four-related cells.
+        opponent = "white" if mover == "black" else "black"
+        threats = state.threat_cells(mover) | state.threat_cells(opponent)
+        killers = self.killers[len(state.moves)]
+        history = self.history[mover]
+        cols = state.cols
+
+        def priority(move):
+            if move == tt_move:
+                return (0, 0)
+            if threats >> (move[0] * cols + move[1]) & 1:
+                return (1, -history[move[0] * MAX_BOARD + move[1]])
+            if move in killers:
+                return (2, 0)
+            return (3, -history[move[0] * MAX_BOARD + move[1]])
+
+        return sorted(moves, key=priority), threats
+
+    def record_cutoff(self, state, move, mover, depth):
+        killers = self.killers[len(state.moves)]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        self.history[mover][move[0] * MAX_BOARD + move[1]] += depth * depth
+
+# Searches by placing and undoing moves on `state` itself; it is left unchanged on return
+# `moves` restricts the moves searched at this node (used for the root)
+def minimax(state, depth, alpha, beta, maximizing_player, player, search=None, moves=None):
+    return drain(minimax_steps(state, depth, alpha, beta, maximizing_player, player, search, moves))
+
+# The searches are generators that yield at every budget check, so a caller such as
+# get_ai_move_async can hand control back to an event loop part way through
+def minimax_steps(state, depth, alpha, beta, maximizing_player, player, search=None, moves=None):
+    if search is None:
+        search = SearchContext()
+    search.nodes += 1
+    if search.nodes >= search.next_check:
+        search.check_budget()
+        yield
+    if depth <= 0:
+        if search.quiescence:
+            return (yield from quiescence_steps(state, alpha, beta, maximizing_player, player, search)), None
+        return evaluate(state, player), None
+
+    key = state.hash ^ SEARCH_KEYS[(player, maximizing_player)]
+    tt_move = None
+    if search.tt is not None:
+        entry = search.tt.probe(key)
+        if entry is not None:
+            entry_depth, bound, score, tt_move = entry
+            if entry_depth >= depth and moves is None:
+                if bound == EXACT:
+                    return score, tt_move
+                if bound == LOWER and score >= beta:
+                    return score, tt_move
+                if bound == UPPER and score <= alpha:
+                    return score, tt_move
+    alpha_orig, beta_orig = alpha, beta
+
+    valid_moves = moves if moves is not None else state.get_valid_moves()
     if not valid_moves:
         return 0, None
-        
-    best_move = random.choice(valid_moves)
-    
-    if maximizing_player:
-        max_eval = float('-inf')
-        for move in valid_moves:
-            row, col = move
-            new_state = GameState(state.board)
-            new_state.board[row][col] = player
-            
-            eval, _ = minimax(new_state, depth - 1, alpha, beta, False, player)
-            
-            if eval > max_eval:
-                max_eval = eval
-                best_move = move
-                
+    if depth == 1 and BATCH_FRONTIER and not search.quiescence:
+        return evaluate_frontier(state, valid_moves, maximizing_player, player)
+
+    opponent = "white" if player == "black" else "black"
+    mover = player if maximizing_player else opponent
+    valid_moves, threats = search.order_moves(state, valid_moves, mover, tt_move)
+    killers = search.killers[len(state.moves)]
+    best_move = valid_moves[0]
+
+    # Futility pruning: close to the leaves, if even a generous margin on the static
+    # score cannot reach the window, only moves that make or block a four are searched
+    futile = pruned = False
+    if search.futility and depth < len(FUTILITY_MARGINS) and moves is None:
+        static_eval = evaluate(state, player)
+        margin = FUTILITY_MARGINS[depth]
+        futile = static_eval + margin <= alpha if maximizing_player else static_eval - margin >= beta
+
+    best_eval = float('-inf') if maximizing_player else float('inf')
+    for i, move in enumerate(valid_moves):
+        row, col = move
+        quiet = i > 0 and not threats >> (row * state.cols + col) & 1 and move not in killers
+        if futile and quiet:
+            pruned = True
+            continue
+
+        state.place(row, col, mover)
+        if i == 0 or not search.pvs:
+            window = (alpha, beta)
+        else:
+            # Principal variation search: prove the move is no better than the best so
+            # far with a null window, and only search it fully if that fails
+            window = (alpha, alpha + 1) if maximizing_player else (beta - 1, beta)
+        # Late move reductions: quiet moves far down the list are searched shallower
+        # first, and again at full depth only if they still look better than the best
+        reduction = 0
+        if search.lmr and quiet and i >= LMR_MIN_MOVES and depth >= LMR_MIN_DEPTH:
+            reduction = LMR_REDUCTION
+        eval, _ = yield from minimax_steps(state, depth - 1 - reduction, *window, not maximizing_player, player, search)
+        if reduction and (eval > alpha if maximizing_player else eval < beta):
+            eval, _ = yield from minimax_steps(state, depth - 1, *window, not maximizing_player, player, search)
+        if window != (alpha, beta) and alpha < eval < beta:
+            eval, _ = yield from minimax_steps(state, depth - 1, alpha, beta, not maximizing_player, player, search)
+        state.undo()
+
+        if eval > best_eval if maximizing_player else eval < best_eval:
+            best_eval = eval
+            best_move = move
+        if maximizing_player:
             alpha = max(alpha, eval)
-            if beta <= alpha:
-                break
-                
-        return max_eval, best_move
+        else:
+            beta = min(beta, eval)
+        if beta <= alpha:
+            search.record_cutoff(state, move, mover, depth)
+            break
+
+    if pruned:
+        # The pruned moves are only known to be no better than the margin
+        if maximizing_player:
+            best_eval = max(best_eval, static_eval + margin)
+        else:
+            best_eval = min(best_eval, static_eval - margin)
+
+    if search.tt is not None:
+        if best_eval <= alpha_orig:
+            bound = UPPER
+        elif best_eval >= beta_orig:
+            bound = LOWER
+        else:
+            bound = EXACT
+        search.tt.store(key, depth, bound, best_eval, best_move)
+    return best_eval, best_move
+
+def quiescence_steps(state, alpha, beta, maximizing_player, player, search, plies=QUIESCENCE_PLIES):
+    # Leaf search over forcing moves only, until the position is quiet. The side to move
+    # completes a five, or blocks the opponent's five, or, against a three that would
+    # become an open four, blocks it or makes a four of its own. Otherwise it may settle
+    # for the static score ("stand pat") or make an open four.
+    search.nodes += 1
+    if search.nodes >= search.next_check:
+        search.check_budget()
+        yield
+    static_eval = evaluate(state, player)
+    if plies == 0 or state.moves and state.winning_line(*state.moves[-1]):
+        return static_eval
+
+    opponent = "white" if player == "black" else "black"
+    mover = player if maximizing_player else opponent
+    other = opponent if maximizing_player else player
+    moves = five_cells(state, mover) or five_cells(state, other)
+    if not moves:
+        moves = open_four_moves(state, other)
+        if moves:
+            moves |= four_moves(state, mover)
+    if moves:
+        best_eval = float('-inf') if maximizing_player else float('inf')
     else:
-        min_eval = float('inf')
-        opponent = "white" if player == "black" else "black"
-        for move in valid_moves:
-            row, col = move
-            new_state = GameState(state.board)
-            new_state.board[row][col] = opponent
-            
-            eval, _ = minimax(new_state, depth - 1, alpha, beta, True, player)
-            
-            if eval < min_eval:
-                min_eval = eval
-                best_move = move
-                
+        best_eval = static_eval
+        if maximizing_player:
+            alpha = max(alpha, static_eval)
+        else:
+            beta = min(beta, static_eval)
+        if beta <= alpha:
+            return static_eval
+        moves = open_four_moves(state, mover)
+
+    for index in iter_bits(moves):
+        row, col = divmod(index, state.cols)
+        state.place(row, col, mover)
+        eval = yield from quiescence_steps(state, alpha, beta, not maximizing_player, player, search, plies - 1)
+        state.undo()
+        if eval > best_eval if maximizing_player else eval < best_eval:
+            best_eval = eval
+        if maximizing_player:
+            alpha = max(alpha, eval)
+        else:
             beta = min(beta, eval)
-            if beta <= alpha:
-                break
-                
-        return min_eval, best_move
+        if beta <= alpha:
+            break
+    return best_eval
 
 def check_win(row, col, player,board):
-    directions = [(1, 0), (0, 1), (1, 1), (1, -1)]
-    for dr, dc in directions:
-        count = 1
-        start, end = (row, col), (row, col)
-        for i in range(1, 5):
-            r, c = row + dr * i, col + dc * i
-            if 0 <= r < ROWS and 0 <= c < COLS and board[r][c] == player:
-                count += 1
-                end = (r, c)
-            else:
-                break
-        for i in range(1, 5):
-            r, c = row - dr * i, col - dc * i
-            if 0 <= r < ROWS and 0 <= c < COLS and board[r][c] == player:
-                count += 1
-                start = (r, c)
+    # Walks the list board out from the new stone, so it costs the same on any board size
+    rows, cols = len(board), len(board[0])
+    for dr, dc in DIRECTIONS:
+        ends = []
+        for step in (-1, 1):
+            r, c = row, col
+            while (0 <= r + step * dr < rows and 0 <= c + step * dc < cols and
+                   board[r + step * dr][c + step * dc] == player):
+                r, c = r + step * dr, c + step * dc
+            ends.append((r, c))
+        if max(abs(ends[1][0] - ends[0][0]), abs(ends[1][1] - ends[0][1])) >= 4:
+            return ends[0], ends[1]
+    return None
+
+def threat_pass(state, current_player, search=None):
+    return drain(threat_pass_steps(state, current_player, search))
+
+def threat_pass_steps(state, current_player, search=None):
+    # Forced-win search before minimax: returns (winning move or None, root moves to
+    # restrict the search to when the opponent has a forced win, or None). It stops
+    # with nothing found once the optional SearchContext runs out of time or is stopped
+    solver = ThreatSolver(search=search)
+    line = yield from solver.find_win_steps(state, current_player)
+    if line is not None:
+        row, col, _ = line[0]
+        return (row, col), None
+    return None, (yield from solver.defences_steps(state, current_player))
+
+def search_root(state, depth, player, search, root_moves=None, scores=()):
+    return drain(search_root_steps(state, depth, player, search, root_moves, scores))
+
+def search_root_steps(state, depth, player, search, root_moves=None, scores=()):
+    # One iterative-deepening step, given the scores of the earlier steps. It starts with
+    # an aspiration window around the score from two plies shallower (consecutive depths
+    # swing widely, as they end on different players' moves) and reopens the side it fails on.
+    previous = scores[-2] if len(scores) >= 2 else None
+    if previous is None or search.aspiration is None:
+        return (yield from minimax_steps(state, depth, float('-inf'), float('inf'), True, player, search, root_moves))
+    alpha, beta = previous - search.aspiration, previous + search.aspiration
+    while True:
+        score, move = yield from minimax_steps(state, depth, alpha, beta, True, player, search, root_moves)
+        if score <= alpha:
+            alpha = float('-inf')
+        elif score >= beta:
+            beta = float('inf')
+        else:
+            return score, move
+
+def first_iteration(state, player, search, root_moves=None):
+    return drain(first_iteration_steps(state, player, search, root_moves))
+
+def first_iteration_steps(state, player, search, root_moves=None):
+    # Depth 1 of the iterative deepening, run to the end whatever the time and node
+    # budget (only `stop` ends it), so there is a searched move to play
+    limits = search.deadline, search.node_limit
+    search.deadline = search.node_limit = None
+    try:
+        return (yield from search_root_steps(state, 1, player, search, root_moves))
+    finally:
+        search.deadline, search.node_limit = limits
+
+def fallback_move(state, player, root_moves=None, search=None):
+    # The first move by move ordering, for when no iteration finished
+    search = search if search is not None else SearchContext()
+    moves, _ = search.order_moves(state, root_moves or state.get_valid_moves(), player, None)
+    return moves[0]
+
+def get_ai_move(board,current_player, tt=None, time_limit=AI_TIME_LIMIT, node_limit=AI_NODE_LIMIT, max_depth=MAX_DEPTH, cache=None, stop=None, search=None):
+    return drain(ai_move_steps(board, current_player, tt, time_limit, node_limit, max_depth, cache, stop, search))
+
+async def get_ai_move_async(board, current_player, tt=None, time_limit=AI_TIME_LIMIT, node_limit=AI_NODE_LIMIT, max_depth=MAX_DEPTH, cache=None, stop=None):
+    # get_ai_move on the calling event loop, for where there are no threads (the web build)
+    return await run_sliced(ai_move_steps(board, current_player, tt, time_limit, node_limit, max_depth, cache, stop))
+
+def ai_move_steps(board, current_player, tt=None, time_limit=AI_TIME_LIMIT, node_limit=AI_NODE_LIMIT, max_depth=MAX_DEPTH, cache=None, stop=None, search=None):
+    # Iterative deepening: returns the best move of the deepest search that finished
+    # within the time and node budget, or before the optional `stop` Event was set.
+    # `cache` is an optional AnalysisCache: a position it holds to max_depth is not
+    # searched again, and finished searches are added to it. `search` is an optional
+    # SearchContext to search with instead of one made from tt and the limits, e.g. with
+    # some search options switched off; its node count is left for the caller. The time
+    # budget runs from the call, so the threat pass before minimax counts against it
+    if search is None:
+        search = SearchContext(tt if tt is not None else TranspositionTable(1), time_limit, node_limit, stop)
+    state = GameState(board)
+    if cache is not None:
+        entry = cache.lookup(state, max_depth)
+        if entry is not None:
+            return entry[0]
+    forced, root_moves = yield from threat_pass_steps(state, current_player, search)
+    if forced is not None:
+        return forced
+    # Only minimax reads the evaluator; attached earlier, every move of the threat pass
+    # would update it for nothing
+    attach_evaluator(state)
+    scores = []
+    move = None
+    for depth in range(1, max_depth + 1):
+        try:
+            if depth == 1:
+                score, move = yield from first_iteration_steps(state, current_player, search, root_moves)
             else:
-                break
-        if count >= 5:
-            return start, end
-    return
+                score, move = yield from search_root_steps(state, depth, current_player, search, root_moves, scores)
+            scores.append(score)
+        except SearchTimeout:
+            while state.moves:
+                state.undo()
+            break
+    if cache is not None and move is not None:
+        cache.store(state, len(scores), scores[-1], move)
+    return move if move is not None else fallback_move(state, current_player, root_moves, search)
+
+def ponder(board, player, tt, stop, max_depth=MAX_DEPTH):
+    drain(ponder_steps(board, player, tt, stop, max_depth))
 
-def get_ai_move(board,current_player):
+def ponder_steps(board, player, tt, stop, max_depth=MAX_DEPTH):
+    # Searches on the opponent's time, until `stop` is set: the positions after the
+    # opponent's PONDER_REPLIES likeliest replies, deepened together, so `tt` is warm
+    # for get_ai_move whichever of them is played. The likeliest reply is the one the
+    # last search expected, if the table still has it.
     state = GameState(board)
-    _, move = minimax(state, MAX_DEPTH, float('-inf'), float('inf'), True, current_player)
-    return move
+    attach_evaluator(state)
+    opponent = "white" if player == "black" else "black"
+    search = SearchContext(tt, stop=stop)
+    entry = tt.probe(state.hash ^ SEARCH_KEYS[(player, False)])
+    replies, _ = search.order_moves(state, state.get_valid_moves(), opponent, entry[3] if entry else None)
+    scores = {reply: [] for reply in replies[:PONDER_REPLIES]}
+    try:
+        for depth in range(1, max_depth + 1):
+            for (row, col), reply_scores in scores.items():
+                state.place(row, col, opponent)
+                score, _ = yield from search_root_steps(state, depth, player, search, scores=reply_scores)
+                reply_scores.append(score)
+                state.undo()
+    except SearchTimeout:
+        pass
@@ -1,23 +1,278 @@
-from constants import *
+from engine_settings import *
+import random
+
+DIRECTIONS = [(1, 0), (0, 1), (1, 1), (1, -1)]
+
+def step_forward(bits, shift, mask):
+    return (bits & mask) << shift
+
+def step_back(bits, shift, mask):
+    return (bits >> shift) & mask
+
+def iter_bits(bits):
+    # Indices of the set bits, lowest (row-major first) first
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+def iter_cells(bits, cols):
+    for index in iter_bits(bits):
+        yield divmod(index, cols)
+
+# Mixed into a position hash by the search: whose turn it is and whose score it is
+_search_keys = random.Random(604)
+SEARCH_KEYS = {(player, maximizing): _search_keys.getrandbits(64)
+               for player in ("black", "white") for maximizing in (True, False)}
+
+class Geometry:
+    # The tables for one board size, built once per size by geometry().
+    # Cell (row, col) lives at bit row * cols + col of a per-player bitmask
+    def __init__(self, rows, cols):
+        self.rows, self.cols = rows, cols
+        self.cells = rows * cols
+        self.board_mask = (1 << self.cells) - 1
+        # (shift, mask) per direction: (bits & mask) << shift moves every stone one step
+        # along the direction, (bits >> shift) & mask one step back, without wrapping rows
+        self.shifts = [(dr * cols + dc, self._direction_mask(dr, dc)) for dr, dc in DIRECTIONS]
+        self.neighbour_masks = [self.neighbours(1 << index) for index in range(self.cells)]
+        # Per direction, the cells a run of five cells along it can start on
+        self.window_starts = []
+        for shift, mask in self.shifts:
+            starts = self.board_mask
+            for _ in range(4):
+                starts = step_back(starts, shift, mask)
+            self.window_starts.append(starts)
+        # Zobrist keys: a position's hash is the XOR of one key per stone. Seeded by
+        # size, so positions on different boards do not share hashes
+        zobrist = random.Random(f"zobrist {rows}x{cols}")
+        self.zobrist = {player: [zobrist.getrandbits(64) for _ in range(self.cells)] for player in ("black", "white")}
+        self.lines = self._lines()
+        self.cell_lines = [[] for _ in range(self.cells)]
+        for line_id, cells in enumerate(self.lines):
+            for position, cell in enumerate(cells):
+                self.cell_lines[cell].append((line_id, position))
+        # Cells within CANDIDATE_RADIUS of each cell; empty cells near a stone are the move candidates
+        self.radius_cells = [self._radius_cells(index, CANDIDATE_RADIUS) for index in range(self.cells)]
+        self.symmetries = self._symmetries()
+        self.inverses = []
+        for perm in self.symmetries:
+            inverse = [0] * self.cells
+            for index, image in enumerate(perm):
+                inverse[image] = index
+            self.inverses.append(inverse)
+
+    def _direction_mask(self, dr, dc):
+        # Cells whose neighbour one step along (dr, dc) is still on the board
+        mask = 0
+        for row in range(self.rows):
+            for col in range(self.cols):
+                if 0 <= row + dr < self.rows and 0 <= col + dc < self.cols:
+                    mask |= 1 << (row * self.cols + col)
+        return mask
+
+    def neighbours(self, bits):
+        spread = 0
+        for shift, mask in self.shifts:
+            spread |= step_forward(bits, shift, mask) | step_back(bits, shift, mask)
+        return spread
+
+    def _radius_cells(self, index, radius):
+        area = 1 << index
+        for _ in range(radius):
+            area |= self.neighbours(area)
+        return list(iter_bits(area & ~(1 << index)))
+
+    def _lines(self):
+        # Every row, column and diagonal long enough to hold a pattern, as cell indices
+        rows, cols = self.rows, self.cols
+        lines = []
+        for dr, dc in DIRECTIONS:
+            for row in range(rows):
+                for col in range(cols):
+                    if 0 <= row - dr < rows and 0 <= col - dc < cols:
+                        continue
+                    cells = []
+                    r, c = row, col
+                    while 0 <= r < rows and 0 <= c < cols:
+                        cells.append(r * cols + c)
+                        r, c = r + dr, c + dc
+                    if len(cells) >= 2:
+                        lines.append(cells)
+        return lines
+
+    def _symmetries(self):
+        # Cell index permutations for the board's symmetries; all 8 on a square board
+        rows, cols = self.rows, self.cols
+        last_row, last_col = rows - 1, cols - 1
+        maps = [lambda r, c: (r, c), lambda r, c: (r, last_col - c),
+                lambda r, c: (last_row - r, c), lambda r, c: (last_row - r, last_col - c)]
+        if rows == cols:
+            maps += [lambda r, c: (c, r), lambda r, c: (c, last_row - r),
+                     lambda r, c: (last_col - c, r), lambda r, c: (last_col - c, last_row - r)]
+        perms = []
+        for transform in maps:
+            perm = [0] * self.cells
+            for index in range(self.cells):
+                row, col = transform(*divmod(index, cols))
+                perm[index] = row * cols + col
+            perms.append(perm)
+        return perms
+
+_geometries = {}
+
+def geometry(rows=ROWS, cols=COLS):
+    if (rows, cols) not in _geometries:
+        _geometries[(rows, cols)] = Geometry(rows, cols)
+    return _geometries[(rows, cols)]
+
+def canonical(state):
+    # (smallest hash over the symmetric positions, the symmetry giving it)
+    zobrist = state.geometry.zobrist
+    best = None
+    for number, perm in enumerate(state.geometry.symmetries):
+        key = 0
+        for player, bits in state.stones.items():
+            keys = zobrist[player]
+            for index in iter_bits(bits):
+                key ^= keys[perm[index]]
+        if best is None or key < best[0]:
+            best = (key, number)
+    return best
+
 class GameState:
-    def __init__(self, board):
-        self.board = [row[:] for row in board]
-        
+    # The board size comes from `board` if given, else from rows and cols
+    def __init__(self, board=None, rows=ROWS, cols=COLS):
+        if board is not None:
+            rows, cols = len(board), len(board[0])
+        self.geometry = geometry(rows, cols)
+        self.cols = cols
+        self.stones = {"black": 0, "white": 0}
+        self.moves = []
+        self.evaluator = None
+        self.hash = 0
+        # Number of stones within CANDIDATE_RADIUS of each cell, and the empty cells it is non-zero for
+        self.nearby = [0] * (rows * cols)
+        self.candidates = 0
+        if board is not None:
+            for row in range(rows):
+                for col in range(cols):
+                    if board[row][col] is not None:
+                        self._put(row * cols + col, board[row][col])
+
+    @classmethod
+    def from_stones(cls, black, white, rows=ROWS, cols=COLS):
+        # Rebuild a state from its two bitboards, as returned by encode()
+        state = cls(rows=rows, cols=cols)
+        for player, bits in (("black", black), ("white", white)):
+            for index in iter_bits(bits):
+                state._put(index, player)
+        return state
+
+    def encode(self):
+        return self.stones["black"], self.stones["white"]
+
+    def copy(self):
+        state = GameState(rows=self.geometry.rows, cols=self.cols)
+        state.stones = dict(self.stones)
+        state.moves = self.moves[:]
+        state.hash = self.hash
+        state.nearby = self.nearby[:]
+        state.candidates = self.candidates
+        return state
+
+    def occupied(self):
+        return self.stones["black"] | self.stones["white"]
+
+    def empty(self):
+        return ~self.occupied() & self.geometry.board_mask
+
+    def get(self, row, col):
+        bit = 1 << (row * self.cols + col)
+        for player, bits in self.stones.items():
+            if bits & bit:
+                return player
+        return None
+
+    def _add_nearby(self, index):
+        nearby = self.nearby
+        empty = self.empty()
+        for cell in self.geometry.radius_cells[index]:
+            nearby[cell] += 1
+            if nearby[cell] == 1 and empty >> cell & 1:
+                self.candidates |= 1 << cell
+        self.candidates &= ~(1 << index)
+
+    def _remove_nearby(self, index):
+        nearby = self.nearby
+        for cell in self.geometry.radius_cells[index]:
+            nearby[cell] -= 1
+            if not nearby[cell]:
+                self.candidates &= ~(1 << cell)
+        if nearby[index]:
+            self.candidates |= 1 << index
+
+    def _put(self, index, player):
+        self.stones[player] |= 1 << index
+        self.hash ^= self.geometry.zobrist[player][index]
+        self._add_nearby(index)
+
+    def place(self, row, col, player):
+        self._put(row * self.cols + col, player)
+        self.moves.append((row, col, player))
+        if self.evaluator is not None:
+            self.evaluator.update(row, col, player, True)
+
+    def undo(self):
+        row, col, player = self.moves.pop()
+        index = row * self.cols + col
+        self.stones[player] &= ~(1 << index)
+        self.hash ^= self.geometry.zobrist[player][index]
+        self._remove_nearby(index)
+        if self.evaluator is not None:
+            self.evaluator.update(row, col, player, False)
+        return row, col, player
+
     def get_valid_moves(self):
-        moves = []
-        for row in range(ROWS):
-            for col in range(COLS):
-                if self.board[row][col] is None and self.has_adjacent_stone(row, col):
-                    moves.append((row, col))
-        return moves if moves else [(row, col) for row in range(ROWS) for col in range(COLS) if self.board[row][col] is None]
+        return list(iter_cells(self.candidates or self.empty(), self.cols))
 
     def has_adjacent_stone(self, row, col):
-        for dr in [-1, 0, 1]:
-            for dc in [-1, 0, 1]:
-                if dr == 0 and dc == 0:
-                    continue
-                r, c = row + dr, col + dc
-                if (0 <= r < ROWS and 0 <= c < COLS and self.board[r][c] is not None):
-                    return True
-        return False
+        return bool(self.geometry.neighbour_masks[row * self.cols + col] & self.occupied())
+
+    def threat_cells(self, player, length=4):
+        # Empty cells where `player` would complete a run of at least `length` stones
+        own = self.stones[player]
+        board_mask = self.geometry.board_mask
+        cells = 0
+        for shift, mask in self.geometry.shifts:
+            ahead = [board_mask]   # cells followed by k own stones
+            behind = [board_mask]  # cells preceded by k own stones
+            for _ in range(length - 1):
+                ahead.append(step_back(own & ahead[-1], shift, mask))
+                behind.append(step_forward(own & behind[-1], shift, mask))
+            for k in range(length):
+                cells |= ahead[k] & behind[length - 1 - k]
+        return cells & self.empty()
 
+    def winning_line(self, row, col, player):
+        own = self.stones[player]
+        origin = 1 << (row * self.cols + col)
+        for shift, mask in self.geometry.shifts:
+            start = end = origin
+            count = 1
+            for _ in range(4):
+                nxt = step_forward(end, shift, mask)
+                if not nxt & own:
+                    break
+                end = nxt
+                count += 1
+            for _ in range(4):
+                prev = step_back(start, shift, mask)
+                if not prev & own:
+                    break
+                start = prev
+                count += 1
+            if count >= 5:
+                return (divmod(start.bit_length() - 1, self.cols),
+                        divmod(end.bit_length() - 1, self.cols))
+        return None
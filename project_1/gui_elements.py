@@ -17,7 +17,7 @@ class Button:
                 min(self.color[2] + 30, 255)) if self.hover else self.color
         pygame.draw.rect(self.WIN, color, self.rect, border_radius=10)
         pygame.draw.rect(self.WIN, WHITE, self.rect, 2, border_radius=10)
-        text_surface = FONT_MEDIUM.render(self.text, True, WHITE)
+        text_surface = font("medium").render(self.text, True, WHITE)
         text_rect = text_surface.get_rect(center=self.rect.center)
         self.WIN.blit(text_surface, text_rect)
 
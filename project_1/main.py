@@ -22,8 +22,12 @@ async def main():
             board.handle_menu()
 
         elif board.game_state == PLAYING or board.game_state == AI_THINKING:
+            if board.game_state == AI_THINKING:
+                # The search runs on another thread; keep the stars moving meanwhile
+                board.draw_grid()
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
+                    board.close()
                     pygame.quit()
                     sys.exit()
 
@@ -48,12 +52,14 @@ async def main():
         elif board.game_state == GAME_OVER:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
+                    board.close()
                     pygame.quit()
                     sys.exit()
 
                 if board.restart_button.handle_event(event):
                     board.game_state = MENU
                 if board.quit_button.handle_event(event):
+                    board.close()
                     pygame.quit()
                     sys.exit()
         
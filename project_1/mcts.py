@@ -0,0 +1,273 @@
+# mcts.py
+# Monte Carlo Tree Search (UCT) engine: an anytime alternative to minimax whose
+# playouts run as NumPy batches of games advanced in lockstep (needs numpy)
+import time
+from engine_settings import *
+from game_state import GameState
+from game_logic import SearchContext, threat_pass_steps
+from steps import drain
+from vectorized import PLAYER_VALUES, board_array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Terminal flags of a node: not checked yet, not terminal, won by the move into it, drawn
+UNKNOWN, OPEN, WON, DRAWN = 0, 1, 2, 3
+FIVE = 5
+
+def _five_cells(mine, empty):
+    # (N, rows, cols) bool: empty cells where the stones in `mine` would complete five
+    pad = FIVE - 1
+    rows, cols = mine.shape[1:]
+    shape = (len(mine), rows + 2 * pad, cols + 2 * pad)
+    own = np.zeros(shape, dtype=np.int8)
+    free = np.zeros(shape, dtype=np.int8)
+    own[:, pad:pad + rows, pad:pad + cols] = mine
+    free[:, pad:pad + rows, pad:pad + cols] = empty
+    cells = np.zeros(shape, dtype=bool)
+    for dr, dc in ((1, 0), (0, 1), (1, 1), (1, -1)):
+        # Window starting at every board cell: its k-th cell is k steps along (dr, dc)
+        views = [(slice(None), slice(pad + k * dr, pad + k * dr + rows), slice(pad + k * dc, pad + k * dc + cols))
+                 for k in range(FIVE)]
+        own_count = sum(own[view] for view in views)
+        free_count = sum(free[view] for view in views)
+        four = (own_count == FIVE - 1) & (free_count == 1)
+        for view in views:
+            cells[view] |= four & free[view].astype(bool)
+    return cells[:, pad:pad + rows, pad:pad + cols]
+
+def _near(occupied):
+    # Cells next to a stone, in any of the 8 directions
+    rows, cols = occupied.shape[1:]
+    padded = np.zeros((len(occupied), rows + 2, cols + 2), dtype=bool)
+    padded[:, 1:-1, 1:-1] = occupied
+    near = np.zeros_like(occupied)
+    for dr in (-1, 0, 1):
+        for dc in (-1, 0, 1):
+            near |= padded[:, 1 + dr:1 + dr + rows, 1 + dc:1 + dc + cols]
+    return near
+
+def run_playouts(boards, movers, rng):
+    return drain(playout_steps(boards, movers, rng))
+
+def playout_steps(boards, movers, rng):
+    # Plays every game in the (N, rows, cols) int8 batch to the end, all in lockstep:
+    # each side completes five if it can, else blocks the opponent's five, else plays
+    # a random cell next to a stone. `movers` holds the value of the side to move in
+    # each game. Returns the winner's value per game, 0 for a draw. Yields after every
+    # move, like the other *_steps searches
+    boards = boards.copy()
+    movers = movers.copy()
+    winners = np.zeros(len(boards), dtype=np.int8)
+    games = np.arange(len(boards))
+    while len(games):
+        # Only the games still running are stepped
+        current = boards[games]
+        count = len(games)
+        empty = current == 0
+        mine = current == movers[games][:, None, None]
+        fives = _five_cells(np.concatenate([mine, ~empty & ~mine]), np.concatenate([empty, empty]))
+        wins, blocks = fives[:count], fives[count:]
+        choices = empty
+        for cells in (_near(~empty) & empty, blocks, wins):
+            choices = np.where(cells.any(axis=(1, 2))[:, None, None], cells, choices)
+        keys = rng.random(current.shape)
+        keys[~choices] = -1
+        rows, cols = np.divmod(keys.reshape(count, -1).argmax(axis=1), boards.shape[2])
+        boards[games, rows, cols] = movers[games]
+        won = wins[np.arange(count), rows, cols]
+        winners[games[won]] = movers[games[won]]
+        movers[games] = 3 - movers[games]
+        # A game also ends when its last empty cell has been filled
+        games = games[~won & (empty.sum(axis=(1, 2)) > 1)]
+        yield
+    return winners
+
+class MCTSSearch:
+    # Keeps its tree between turns: the next search starts from the node reached by the
+    # two moves played since, if the tree has it. Nodes live in flat arrays; a node's
+    # children are one contiguous block.
+    def __init__(self, max_nodes=MCTS_MAX_NODES, leaves=MCTS_LEAVES, rollouts=MCTS_ROLLOUTS,
+                 exploration=MCTS_EXPLORATION, seed=None):
+        if np is None:
+            raise ImportError("the MCTS engine needs numpy installed")
+        self.max_nodes = max_nodes
+        self.leaves = leaves
+        self.rollouts = rollouts
+        self.exploration = exploration
+        self.rng = np.random.default_rng(seed)
+        self.parent = np.zeros(max_nodes, dtype=np.int32)
+        self.move = np.zeros(max_nodes, dtype=np.int16)
+        self.first_child = np.zeros(max_nodes, dtype=np.int32)
+        self.child_count = np.zeros(max_nodes, dtype=np.int16)
+        self.visits = np.zeros(max_nodes, dtype=np.float64)
+        self.wins = np.zeros(max_nodes, dtype=np.float64)
+        self.terminal = np.zeros(max_nodes, dtype=np.int8)
+        self.playouts = 0
+        self.reset()
+
+    def reset(self):
+        self.size = 0
+        self.root = self._new_nodes(-1, [-1])
+        self.root_stones = None
+        self.root_player = None
+        self.root_geometry = None
+
+    def _new_nodes(self, parent, moves):
+        start, end = self.size, self.size + len(moves)
+        self.parent[start:end] = parent
+        self.move[start:end] = moves
+        self.first_child[start:end] = -1
+        self.child_count[start:end] = 0
+        self.visits[start:end] = 0
+        self.wins[start:end] = 0
+        self.terminal[start:end] = UNKNOWN
+        self.size = end
+        return start
+
+    def _child(self, node, index):
+        if self.first_child[node] < 0:
+            return None
+        first = self.first_child[node]
+        children = np.nonzero(self.move[first:first + self.child_count[node]] == index)[0]
+        return first + int(children[0]) if len(children) else None
+
+    def _reroot(self, state, player):
+        # Moves the root down the tree along the moves played since the last search,
+        # or starts a new tree
+        if (self.root_player == player and self.root_geometry is state.geometry and
+                self.size < self.max_nodes * 9 // 10):
+            opponent = "white" if player == "black" else "black"
+            black, white = self.root_stones
+            own = state.stones[player] & ~(black if player == "black" else white)
+            opp = state.stones[opponent] & ~(white if player == "black" else black)
+            kept = state.stones["black"] & black == black and state.stones["white"] & white == white
+            if kept and not own and not opp:
+                return
+            if kept and own.bit_count() == 1 and opp.bit_count() == 1:
+                node = self._child(self.root, own.bit_length() - 1)
+                if node is not None:
+                    node = self._child(node, opp.bit_length() - 1)
+                if node is not None:
+                    self.root = node
+                    self.root_stones = state.encode()
+                    return
+        self.reset()
+        self.root_player = player
+        self.root_geometry = state.geometry
+        self.root_stones = state.encode()
+
+    def _select(self, state, player):
+        # Walks from the root by UCT to a leaf, placing the moves on `state`, and adds a
+        # virtual loss of one batch of rollouts along the way so that the other leaves
+        # of the batch spread out. Returns the path and the side to move at the leaf
+        node = self.root
+        path = [node]
+        mover = player
+        self.visits[node] += self.rollouts
+        while self.terminal[node] != WON and self.terminal[node] != DRAWN:
+            if self.first_child[node] < 0:
+                if node != self.root and self.visits[node] <= self.rollouts:
+                    break
+                moves = [row * state.cols + col for row, col in state.get_valid_moves()]
+                if not moves:
+                    self.terminal[node] = DRAWN
+                    break
+                if self.size + len(moves) > self.max_nodes:
+                    break
+                self.first_child[node] = self._new_nodes(node, moves)
+                self.child_count[node] = len(moves)
+            first = self.first_child[node]
+            last = first + self.child_count[node]
+            visits = self.visits[first:last]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scores = (self.wins[first:last] / visits +
+                          self.exploration * np.sqrt(np.log(self.visits[node]) / visits))
+            scores[visits == 0] = np.inf
+            node = first + int(scores.argmax())
+            row, col = divmod(int(self.move[node]), state.cols)
+            state.place(row, col, mover)
+            if self.terminal[node] == UNKNOWN:
+                self.terminal[node] = WON if state.winning_line(row, col, mover) else OPEN
+            path.append(node)
+            self.visits[node] += self.rollouts
+            mover = "white" if mover == "black" else "black"
+        return path, mover
+
+    def _backpropagate(self, path, leaf_mover, winners):
+        # Credits each node on the path with the wins of the side that moved into it;
+        # its visits were already counted by the virtual loss
+        draws = np.count_nonzero(winners == 0) / 2
+        results = {player: np.count_nonzero(winners == value) + draws for player, value in PLAYER_VALUES.items()}
+        mover = leaf_mover
+        for node in reversed(path):
+            mover = "white" if mover == "black" else "black"
+            self.wins[node] += results[mover]
+
+    def get_move(self, board, current_player, time_limit=AI_TIME_LIMIT, playouts=MCTS_PLAYOUTS, stop=None):
+        return drain(self.move_steps(board, current_player, time_limit, playouts, stop))
+
+    def move_steps(self, board, current_player, time_limit=AI_TIME_LIMIT, playouts=MCTS_PLAYOUTS, stop=None):
+        # Search until the time or playout budget runs out (or `stop` is set), yielding
+        # after every batch, and play the most visited root move. The threat pass first
+        # runs under the same deadline and `stop`
+        budget = SearchContext(time_limit=time_limit, stop=stop)
+        deadline = budget.deadline
+        state = GameState(board)
+        forced, root_moves = yield from threat_pass_steps(state, current_player, budget)
+        if forced is not None:
+            return forced
+        self._reroot(state, current_player)
+        self.playouts = 0
+        while True:
+            leaves = []
+            for _ in range(self.leaves):
+                path, mover = self._select(state, current_player)
+                leaves.append((path, mover, board_array(state)))
+                for _ in range(len(path) - 1):
+                    state.undo()
+            rollout = [i for i, (path, _, _) in enumerate(leaves) if self.terminal[path[-1]] not in (WON, DRAWN)]
+            if rollout:
+                boards = np.repeat(np.stack([leaves[i][2] for i in rollout]), self.rollouts, axis=0)
+                movers = np.repeat([PLAYER_VALUES[leaves[i][1]] for i in rollout], self.rollouts).astype(np.int8)
+                winners = yield from playout_steps(boards, movers, self.rng)
+                winners = winners.reshape(len(rollout), self.rollouts)
+            for i, (path, mover, _) in enumerate(leaves):
+                if self.terminal[path[-1]] == WON:
+                    # The side that moved into the leaf has won every playout
+                    result = np.full(self.rollouts, PLAYER_VALUES["white" if mover == "black" else "black"])
+                elif self.terminal[path[-1]] == DRAWN:
+                    result = np.zeros(self.rollouts)
+                else:
+                    result = winners[rollout.index(i)]
+                self._backpropagate(path, mover, result)
+            self.playouts += self.leaves * self.rollouts
+            yield
+            if playouts is not None and self.playouts >= playouts:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if stop is not None and stop.is_set():
+                break
+        return self.best_move(root_moves)
+
+    def best_move(self, allowed=None):
+        first = self.first_child[self.root]
+        visits = self.visits[first:first + self.child_count[self.root]].copy()
+        moves = [divmod(int(move), self.root_geometry.cols) for move in self.move[first:first + len(visits)]]
+        if allowed:
+            for i, move in enumerate(moves):
+                if move not in allowed:
+                    visits[i] = -1
+        return moves[int(visits.argmax())]
+
+_engine = None
+
+def get_ai_move(board, current_player, time_limit=AI_TIME_LIMIT, playouts=MCTS_PLAYOUTS):
+    # Same call as game_logic.get_ai_move, on one engine whose tree lasts between calls
+    global _engine
+    if _engine is None:
+        _engine = MCTSSearch()
+    return _engine.get_move(board, current_player, time_limit, playouts)
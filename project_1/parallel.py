@@ -0,0 +1,180 @@
+# parallel.py
+# Multi-process AI search on worker pools that are reused across turns
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from engine_settings import *
+from game_state import GameState
+from game_logic import (SearchContext, SearchTimeout, attach_evaluator, fallback_move, first_iteration,
+                        minimax, search_root, threat_pass)
+from transposition import TranspositionTable, SharedTranspositionTable
+
+# Root splitting: the root moves are divided between the workers, which share the
+# best score found so far as their alpha bound. Set in each worker by _init_worker
+_shared_alpha = None
+_worker_tt = None
+_worker_stop = None
+
+def _init_worker(shared_alpha, tt_size_mb, stop):
+    global _shared_alpha, _worker_tt, _worker_stop
+    _shared_alpha = shared_alpha
+    _worker_stop = stop
+    # Each worker keeps its own table for the lifetime of the pool, across turns
+    _worker_tt = TranspositionTable(tt_size_mb)
+
+def _search_root_moves(black, white, size, player, moves, depth, time_limit, node_limit):
+    # Search `moves` from the position, raising the shared alpha whenever one beats it.
+    # Returns (best score, best move) among the moves that beat alpha, nodes, finished
+    state = GameState.from_stones(black, white, *size)
+    attach_evaluator(state)
+    search = SearchContext(_worker_tt, time_limit, node_limit, _worker_stop)
+    opponent = "white" if player == "black" else "black"
+    best = None
+    try:
+        for move in moves:
+            alpha = _shared_alpha.value
+            state.place(move[0], move[1], player)
+            score, _ = minimax(state, depth - 1, alpha, float('inf'), False, player, search)
+            state.undo()
+            if score > alpha:
+                if best is None or score > best[0]:
+                    best = (score, move)
+                with _shared_alpha.get_lock():
+                    if score > _shared_alpha.value:
+                        _shared_alpha.value = score
+    except SearchTimeout:
+        return best, search.nodes, False
+    return best, search.nodes, True
+
+class RootParallelSearch:
+    # Keeps a process pool alive between turns; call close() when done with it
+    def __init__(self, workers=PARALLEL_WORKERS, tt_size_mb=TT_SIZE_MB):
+        self.workers = workers
+        self.alpha = multiprocessing.Value('d', float('-inf'))
+        self.stop = multiprocessing.Event()
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                        initargs=(self.alpha, tt_size_mb, self.stop))
+        self.nodes = 0
+
+    def get_move(self, board, current_player, time_limit=AI_TIME_LIMIT, node_limit=AI_NODE_LIMIT, max_depth=MAX_DEPTH):
+        self.stop.clear()
+        # The threat pass runs under the move's deadline, which the workers then share
+        budget = SearchContext(time_limit=time_limit, stop=self.stop)
+        deadline = budget.deadline
+        state = GameState(board)
+        forced, root_moves = threat_pass(state, current_player, budget)
+        if forced is not None:
+            return forced
+        black, white = state.encode()
+        size = (len(board), len(board[0]))
+        moves, _ = SearchContext().order_moves(state, root_moves or state.get_valid_moves(), current_player, None)
+        self.nodes = 0
+        best_move = moves[0]
+        for depth in range(1, max_depth + 1):
+            remaining = deadline - time.perf_counter() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                break
+            # Node budget is shared out evenly between the workers
+            worker_nodes = node_limit // self.workers if node_limit is not None else None
+            self.alpha.value = float('-inf')
+            futures = [self.pool.submit(_search_root_moves, black, white, size, current_player,
+                                        moves[i::self.workers], depth, remaining, worker_nodes)
+                       for i in range(self.workers) if moves[i::self.workers]]
+            results = [future.result() for future in futures]
+            self.nodes += sum(nodes for _, nodes, _ in results)
+            if not all(finished for _, _, finished in results):
+                break
+            found = [best for best, _, _ in results if best is not None]
+            if found:
+                best_move = max(found, key=lambda best: (best[0], -moves.index(best[1])))[1]
+                # Search the previous iteration's best move first next time
+                moves.remove(best_move)
+                moves.insert(0, best_move)
+        return best_move
+
+    def cancel(self):
+        # Ends a get_move() running in another thread at its next budget check
+        self.stop.set()
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+# Lazy SMP: every worker searches the whole root, sharing one table in shared memory
+_shared_tt = None
+_stop = None
+
+def _init_smp_worker(tt_name, tt_buckets, stop):
+    global _shared_tt, _stop
+    _shared_tt = SharedTranspositionTable(name=tt_name, buckets=tt_buckets)
+    _stop = stop
+
+def _lazy_smp_search(black, white, size, player, root_moves, worker_id, time_limit, node_limit, max_depth):
+    # Iterative deepening from the root. Helpers (worker_id > 0) start every other one a
+    # ply deeper and break history ties randomly, so they fill the table with different
+    # parts of the tree. Returns (deepest finished depth, its best move, nodes)
+    state = GameState.from_stones(black, white, *size)
+    attach_evaluator(state)
+    search = SearchContext(_shared_tt, time_limit, node_limit, _stop)
+    if worker_id:
+        rng = random.Random(worker_id)
+        for history in search.history.values():
+            for index in range(len(history)):
+                history[index] = rng.randrange(8)
+    finished, scores, best_move = 0, [], None
+    try:
+        for depth in range(1 + worker_id % 2, max_depth + 1):
+            if depth == 1 and not worker_id:
+                # The main worker always finishes depth 1, so it has a searched move
+                score, best_move = first_iteration(state, player, search, root_moves)
+            else:
+                score, best_move = search_root(state, depth, player, search, root_moves, scores)
+            scores.append(score)
+            finished = depth
+    except SearchTimeout:
+        pass
+    return finished, best_move, search.nodes
+
+class LazySMPSearch:
+    # Keeps the pool and the shared table alive between turns; call close() when done
+    def __init__(self, workers=PARALLEL_WORKERS, tt_size_mb=TT_SIZE_MB):
+        self.workers = workers
+        self.tt = SharedTranspositionTable(tt_size_mb)
+        self.stop = multiprocessing.Event()
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_smp_worker,
+                                        initargs=(self.tt.name, self.tt.buckets, self.stop))
+        self.nodes = 0
+
+    def get_move(self, board, current_player, time_limit=AI_TIME_LIMIT, node_limit=AI_NODE_LIMIT, max_depth=MAX_DEPTH):
+        self.stop.clear()
+        # The threat pass runs under the move's deadline; the workers get what is left
+        budget = SearchContext(time_limit=time_limit, stop=self.stop)
+        state = GameState(board)
+        forced, root_moves = threat_pass(state, current_player, budget)
+        if forced is not None:
+            return forced
+        black, white = state.encode()
+        size = (len(board), len(board[0]))
+        worker_nodes = node_limit // self.workers if node_limit is not None else None
+        remaining = max(budget.deadline - time.perf_counter(), 0) if budget.deadline is not None else None
+        futures = [self.pool.submit(_lazy_smp_search, black, white, size, current_player, root_moves,
+                                    worker_id, remaining, worker_nodes, max_depth)
+                   for worker_id in range(self.workers)]
+        # The main worker decides when the search is over; helpers are stopped with it
+        main = futures[0].result()
+        self.stop.set()
+        results = [main] + [future.result() for future in futures[1:]]
+        self.nodes = sum(nodes for _, _, nodes in results)
+        depth, move, _ = max(results, key=lambda result: result[0])
+        if move is None:
+            move = fallback_move(state, current_player, root_moves)
+        return move
+
+    def cancel(self):
+        self.stop.set()
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+        self.tt.close(unlink=True)
+
+SEARCHERS = {"root": RootParallelSearch, "smp": LazySMPSearch}
@@ -0,0 +1,28 @@
+# steps.py
+# Drivers for the generator searches (the *_steps functions), which yield at every
+# budget check: run one to the end at once, or in slices on an event loop
+import time
+from engine_settings import *
+
+def drain(steps):
+    # Runs a generator search to the end and returns its result
+    try:
+        while True:
+            next(steps)
+    except StopIteration as done:
+        return done.value
+
+async def run_sliced(steps):
+    # Runs a generator search on the event loop, giving the loop a turn after every
+    # AI_TIME_SLICE seconds of work. asyncio is imported here, where a loop is already
+    # running, so that headless users of the engine don't load it
+    import asyncio
+    slice_end = time.perf_counter() + AI_TIME_SLICE
+    try:
+        while True:
+            next(steps)
+            if time.perf_counter() >= slice_end:
+                await asyncio.sleep(0)
+                slice_end = time.perf_counter() + AI_TIME_SLICE
+    except StopIteration as done:
+        return done.value
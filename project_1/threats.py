@@ -0,0 +1,221 @@
+# threats.py
+# Threat-space search: looks only at attacking moves (fours, and optionally threes)
+# and the defender's forced replies, to find forced wins far beyond the minimax depth
+from engine_settings import *
+from game_state import iter_bits
+from steps import drain
+
+class ThreatLimit(Exception):
+    pass
+
+class PhaseLimit(Exception):
+    pass
+
+def five_cells(state, player):
+    # Cells where `player` completes five right away: the empty cell of each five-cell
+    # window whose other four cells are `player`'s, found for all windows of a
+    # direction at once from which four of a window's cells are own stones
+    own = state.stones[player]
+    cells = 0
+    for (shift, _), starts in zip(state.geometry.shifts, state.geometry.window_starts):
+        a, b, c, d, e = (own >> k * shift for k in range(5))
+        ab, de = a & b, d & e
+        abc, cde = ab & c, c & de
+        starts &= abc & d | b & cde | ab & de | a & cde | abc & e
+        for k in range(5):
+            cells |= starts << k * shift
+    return cells & state.empty()
+
+def window_cells(state, player, stones):
+    # Empty cells of the five-cell windows holding exactly `stones` of `player`'s
+    # stones and none of the opponent's. Each direction's windows are handled at once,
+    # as the bitmask of the cells they start on, so the cost does not grow with the board
+    opponent = "white" if player == "black" else "black"
+    own, opp = state.stones[player], state.stones[opponent]
+    cells = 0
+    for (shift, _), starts in zip(state.geometry.shifts, state.geometry.window_starts):
+        # Bit s of the k-th value: whether cell k of the window starting at s holds a
+        # stone. The window fits, so no shift wraps a row
+        a, b, c, d, e = (own >> k * shift for k in range(5))
+        blocked = opp | opp >> shift | opp >> 2 * shift | opp >> 3 * shift | opp >> 4 * shift
+        # Count the own stones of every window at once, as three bit planes
+        ab = a ^ b
+        abc, carry = ab ^ c, a & b | ab & c
+        ones = abc ^ d ^ e
+        carry2 = abc & (d | e) | d & e
+        twos = carry ^ carry2
+        fours = carry & carry2
+        starts &= ~blocked
+        starts &= (ones if stones & 1 else ~ones) & (twos if stones & 2 else ~twos) & (fours if stones & 4 else ~fours)
+        for k in range(5):
+            cells |= starts << k * shift
+    return cells & ~own
+
+def four_moves(state, player):
+    return window_cells(state, player, 3)
+
+def open_four_moves(state, player):
+    # Cells where `player` makes a four that completes five in two places. Each four is
+    # tried on the bitboard alone: state.place would also update the hash, the
+    # candidates and any evaluator attached, none of which five_cells reads
+    own = state.stones[player]
+    cells = 0
+    try:
+        for index in iter_bits(four_moves(state, player)):
+            state.stones[player] = own | 1 << index
+            if five_cells(state, player).bit_count() >= 2:
+                cells |= 1 << index
+    finally:
+        state.stones[player] = own
+    return cells
+
+class ThreatSolver:
+    # `search` is an optional SearchContext whose deadline and stop Event also end the
+    # search, checked every NODE_CHECK_INTERVAL nodes; running out counts as no win found
+    def __init__(self, node_limit=THREAT_NODE_LIMIT, max_plies=THREAT_MAX_PLIES, use_threes=THREAT_USE_THREES,
+                 search=None, three_node_limit=THREAT_THREE_NODE_LIMIT):
+        self.node_limit = node_limit
+        self.three_node_limit = three_node_limit
+        self.phase_end = None
+        self.search = search
+        self.max_plies = max_plies
+        self.use_threes = use_threes
+        self.threes = False
+        self.nodes = 0
+
+    def find_win(self, state, attacker):
+        return drain(self.find_win_steps(state, attacker))
+
+    def defences(self, state, player):
+        return drain(self.defences_steps(state, player))
+
+    # The searches are generators that yield at every node, like minimax_steps
+    def find_win_steps(self, state, attacker):
+        # Forced winning line for `attacker` (to move) as a list of (row, col, player),
+        # or None if there is none within the ply, node and time limits
+        self.nodes = 0
+        try:
+            return (yield from self._solve(state, attacker))
+        except ThreatLimit:
+            return None
+
+    def defences_steps(self, state, player):
+        # Moves for `player` (to move) after which the opponent has no forced win.
+        # None if the opponent has no forced win to stop, if nothing stops it, or if
+        # the node limit runs out before every candidate is checked.
+        opponent = "white" if player == "black" else "black"
+        self.nodes = 0
+        try:
+            if (yield from self._solve(state, opponent)) is None:
+                return None
+            candidates = (window_cells(state, opponent, 4) | window_cells(state, opponent, 3) |
+                          four_moves(state, player))
+            if self.use_threes:
+                candidates |= window_cells(state, opponent, 2)
+            defences = []
+            for index in iter_bits(candidates):
+                row, col = divmod(index, state.cols)
+                state.place(row, col, player)
+                try:
+                    if (yield from self._solve(state, opponent)) is None:
+                        defences.append((row, col))
+                finally:
+                    state.undo()
+        except ThreatLimit:
+            return None
+        return defences or None
+
+    def _solve(self, state, attacker):
+        # Fours only first, then with threes, each with a growing ply limit so short
+        # wins are found before the search wanders down long lines. Threes branch far
+        # more, so their phase stops after three_node_limit nodes, which like the ply
+        # limit counts as no win found
+        for threes in ((False, True) if self.use_threes else (False,)):
+            self.threes = threes
+            self.phase_end = self.nodes + self.three_node_limit if threes else None
+            try:
+                for plies in range(3, self.max_plies + 1, 2):
+                    line = yield from self._attack(state, attacker, plies)
+                    if line is not None:
+                        return line
+            except PhaseLimit:
+                pass
+        return None
+
+    def _replies(self, state, attacker):
+        # Defender moves that can matter against a three: cells of windows where the
+        # attacker already has three stones, plus the defender's own fours
+        defender = "white" if attacker == "black" else "black"
+        return window_cells(state, attacker, 3) | four_moves(state, defender)
+
+    def _winning_threat(self, state, attacker):
+        # True if `attacker` has a move that leaves two cells completing five
+        return bool(open_four_moves(state, attacker))
+
+    def _attack(self, state, attacker, plies):
+        self.nodes += 1
+        if self.nodes > self.node_limit:
+            raise ThreatLimit
+        if self.phase_end is not None and self.nodes > self.phase_end:
+            raise PhaseLimit
+        # From the first node on, so a search that is already out of time stops at once
+        if self.search is not None and self.nodes % NODE_CHECK_INTERVAL == 1 and self.search.out_of_time():
+            raise ThreatLimit
+        yield
+        defender = "white" if attacker == "black" else "black"
+        fives = five_cells(state, attacker)
+        if fives:
+            row, col = divmod(fives.bit_length() - 1, state.cols)
+            return [(row, col, attacker)]
+        if plies < 3:
+            return None
+        blocks = five_cells(state, defender)
+        if blocks:
+            # The attacker has to block; that only keeps the initiative if it makes a four
+            if blocks.bit_count() > 1:
+                return None
+            moves = blocks & four_moves(state, attacker)
+        else:
+            moves = four_moves(state, attacker)
+            if self.threes and plies >= 5:
+                moves |= window_cells(state, attacker, 2)
+
+        for index in iter_bits(moves):
+            row, col = divmod(index, state.cols)
+            state.place(row, col, attacker)
+            try:
+                line = yield from self._after_attack(state, attacker, defender, plies)
+            finally:
+                state.undo()
+            if line is not None:
+                return [(row, col, attacker)] + line
+        return None
+
+    def _after_attack(self, state, attacker, defender, plies):
+        # Defender to move after an attacking move: the forced reply to a four, or
+        # every reply that might stop a three
+        fives = five_cells(state, attacker)
+        if fives.bit_count() >= 2:
+            return []
+        if fives:
+            replies = fives
+        elif self.threes and plies >= 5 and self._winning_threat(state, attacker):
+            if five_cells(state, defender):
+                return None
+            replies = self._replies(state, attacker)
+        else:
+            return None
+
+        principal = None
+        for index in iter_bits(replies):
+            row, col = divmod(index, state.cols)
+            state.place(row, col, defender)
+            try:
+                line = yield from self._attack(state, attacker, plies - 2)
+            finally:
+                state.undo()
+            if line is None:
+                return None
+            if principal is None:
+                principal = [(row, col, defender)] + line
+        return principal
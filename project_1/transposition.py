@@ -0,0 +1,114 @@
+# transposition.py
+from array import array
+from engine_settings import *
+
+# Bound types: the stored score is exact, a lower bound (fail high) or an upper bound (fail low)
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# key (8) + score (8) + move (2) + depth (1) + bound (1); moves are kept as
+# row * MAX_BOARD + col so one table serves every board size
+ENTRY_BYTES = 20
+
+class TranspositionTable:
+    # Fixed-size table of two-entry buckets: the first slot keeps the deepest search
+    # of a position, the second always takes the newest entry that loses to it
+    def __init__(self, size_mb=TT_SIZE_MB):
+        self.buckets = max(1, size_mb * 1024 * 1024 // (2 * ENTRY_BYTES))
+        slots = 2 * self.buckets
+        self.keys = array('Q', bytes(8 * slots))
+        self.scores = array('q', bytes(8 * slots))
+        self.moves = array('h', [-1]) * slots
+        self.depths = array('b', [-1]) * slots
+        self.bounds = array('b', bytes(slots))
+
+    def clear(self):
+        slots = 2 * self.buckets
+        self.keys = array('Q', bytes(8 * slots))
+        self.moves = array('h', [-1]) * slots
+        self.depths = array('b', [-1]) * slots
+
+    def probe(self, key):
+        # (depth, bound, score, move) stored for `key`, or None
+        slot = key % self.buckets * 2
+        for slot in (slot, slot + 1):
+            if self.keys[slot] == key and self.depths[slot] >= 0:
+                move = self.moves[slot]
+                return (self.depths[slot], self.bounds[slot], self.scores[slot],
+                        divmod(move, MAX_BOARD) if move >= 0 else None)
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        slot = key % self.buckets * 2
+        if self.keys[slot] != key and depth < self.depths[slot]:
+            slot += 1
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.bounds[slot] = bound
+        self.scores[slot] = score
+        self.moves[slot] = move[0] * MAX_BOARD + move[1] if move is not None else -1
+
+# One slot of the shared table: the packed entry, and the key XOR-ed with it
+SHARED_ENTRY = [('check', '<u8'), ('data', '<u8')]
+SCORE_OFFSET = 1 << 31
+
+def _pack(depth, bound, score, move):
+    score = min(max(score + SCORE_OFFSET, 0), (1 << 32) - 1)
+    return score | (move + 1) << 32 | (depth + 1) << 48 | bound << 56
+
+class SharedTranspositionTable:
+    # TranspositionTable stored in shared memory so several processes can use it.
+    # Writes take no lock: a slot holds (key ^ data, data), and a reader only trusts
+    # it if the two still XOR to its key, which a torn write from another process breaks.
+    def __init__(self, size_mb=TT_SIZE_MB, name=None, buckets=None):
+        # Loaded here rather than with the module, which the single-process engine imports
+        from multiprocessing import shared_memory
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("the shared transposition table needs numpy installed")
+        if name is None:
+            self.buckets = max(1, size_mb * 1024 * 1024 // (2 * 16))
+            self.memory = shared_memory.SharedMemory(create=True, size=self.buckets * 2 * 16)
+        else:
+            self.buckets = buckets
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.slots = np.ndarray((2 * self.buckets,), dtype=SHARED_ENTRY, buffer=self.memory.buf)
+        if name is None:
+            self.clear()
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def clear(self):
+        self.slots[:] = 0
+
+    def _read(self, slot, key):
+        data = int(self.slots[slot]['data'])
+        if int(self.slots[slot]['check']) ^ data != key or data >> 48 & 0xff == 0:
+            return None
+        return data
+
+    def probe(self, key):
+        slot = key % self.buckets * 2
+        for slot in (slot, slot + 1):
+            data = self._read(slot, key)
+            if data is not None:
+                move = (data >> 32 & 0xffff) - 1
+                return ((data >> 48 & 0xff) - 1, data >> 56, (data & 0xffffffff) - SCORE_OFFSET,
+                        divmod(move, MAX_BOARD) if move >= 0 else None)
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        slot = key % self.buckets * 2
+        existing = int(self.slots[slot]['data'])
+        if self._read(slot, key) is None and depth < (existing >> 48 & 0xff) - 1:
+            slot += 1
+        data = _pack(depth, bound, score, move[0] * MAX_BOARD + move[1] if move is not None else -1)
+        self.slots[slot] = (key ^ data, data)
+
+    def close(self, unlink=False):
+        del self.slots
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
@@ -0,0 +1,98 @@
+# vectorized.py
+# Optional NumPy evaluator: scores whole boards (or batches of boards) at once
+from engine_settings import *
+from game_state import DIRECTIONS, geometry
+from game_logic import OWN_SCORES, OPP_SCORES, EMPTY, OWN, BLOCKED, WINDOW, eval_tables, evaluate_position
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Cell values of the int8 board arrays
+PLAYER_VALUES = {"black": 1, "white": 2}
+WALL = 3
+PAD = WINDOW - 1
+
+if np is not None:
+    OWN_TABLE = np.array(OWN_SCORES, dtype=np.int64)
+    OPP_TABLE = np.array(OPP_SCORES, dtype=np.int64)
+
+# Center bonus per cell as a (rows, cols) array, by board size
+_center_tables = {}
+
+def _center_table(rows, cols):
+    if (rows, cols) not in _center_tables:
+        bonus = eval_tables(geometry(rows, cols)).center_bonus
+        _center_tables[(rows, cols)] = np.array(bonus, dtype=np.int64).reshape(rows, cols)
+    return _center_tables[(rows, cols)]
+
+def _bit_array(bits, rows, cols):
+    raw = np.frombuffer(bits.to_bytes((rows * cols + 7) // 8, "little"), dtype=np.uint8)
+    return np.unpackbits(raw, bitorder="little")[:rows * cols].reshape(rows, cols)
+
+def board_array(state):
+    rows, cols = state.geometry.rows, state.geometry.cols
+    board = np.zeros((rows, cols), dtype=np.int8)
+    for player, value in PLAYER_VALUES.items():
+        board += _bit_array(state.stones[player], rows, cols).astype(np.int8) * value
+    return board
+
+def _window_codes(padded, value):
+    # Base-3 window code (same coding as game_logic's tables) of the run that could
+    # start at every board cell, in every direction: shape (N, 4, rows, cols)
+    rows, cols = padded.shape[1] - 2 * PAD, padded.shape[2] - 2 * PAD
+    digits = np.where(padded == value, OWN, np.where(padded == 0, EMPTY, BLOCKED)).astype(np.int16)
+    codes = np.zeros((len(padded), len(DIRECTIONS), rows, cols), dtype=np.int16)
+    for d, (dr, dc) in enumerate(DIRECTIONS):
+        for k in range(WINDOW):
+            row0 = PAD + (k - 1) * dr
+            col0 = PAD + (k - 1) * dc
+            codes[:, d] += digits[:, row0:row0 + rows, col0:col0 + cols] * 3 ** k
+    return codes
+
+def score_boards(boards, player):
+    # evaluate_position for a (N, rows, cols) int8 batch of boards, as an (N,) array
+    own = PLAYER_VALUES[player]
+    opp = PLAYER_VALUES["white" if player == "black" else "black"]
+    rows, cols = boards.shape[1:]
+    padded = np.full((len(boards), rows + 2 * PAD, cols + 2 * PAD), WALL, dtype=np.int8)
+    padded[:, PAD:PAD + rows, PAD:PAD + cols] = boards
+    scores = (OWN_TABLE[_window_codes(padded, own)].sum(axis=(1, 2, 3)) -
+              OPP_TABLE[_window_codes(padded, opp)].sum(axis=(1, 2, 3)))
+    scores += (_center_table(rows, cols) * ((boards == own).astype(np.int64) - (boards == opp))).sum(axis=(1, 2))
+    return scores
+
+def score_children(state, moves, mover, player):
+    # Scores of every child of `state` reached by `mover` playing one of `moves`,
+    # evaluated in one batch
+    if isinstance(state.evaluator, ArrayEvaluator):
+        board = state.evaluator.board
+    else:
+        board = board_array(state)
+    rows, cols = np.array(moves).T
+    boards = np.repeat(board[np.newaxis], len(moves), axis=0)
+    boards[np.arange(len(moves)), rows, cols] = PLAYER_VALUES[mover]
+    return score_boards(boards, player)
+
+class ArrayEvaluator:
+    # Drop-in for IncrementalEvaluator that keeps an int8 copy of the board and
+    # rescores it with score_boards
+    def __init__(self, state, check=False):
+        if np is None:
+            raise ImportError("the numpy evaluator needs numpy installed")
+        self.state = state
+        self.check = check
+        self.board = board_array(state)
+
+    def update(self, row, col, player, placed):
+        self.board[row, col] = PLAYER_VALUES[player] if placed else 0
+
+    def score(self, player):
+        score = int(score_boards(self.board[np.newaxis], player)[0])
+        if self.check:
+            expected = evaluate_position(self.state, player)
+            if score != expected:
+                raise AssertionError(
+                    f"numpy score {score} != full scan {expected} after {self.state.moves}")
+        return score